@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+git-guard-client.py - Thin client for the git-guard server
+
+Sends a command to a running `git-guard.py --serve` over its Unix domain
+socket and prints the JSON verdict. If the socket is absent or the server
+does not answer, the command is checked in-process with scripts/git-guard.py,
+producing the same decision and the same JSON.
+
+Deliberately imports only json/os/socket/sys/time on the fast path, so
+callers pay interpreter startup but no pattern compilation per call.
+
+NOT A DROP-IN FOR THE HOOK: the server applies scripts/git-guard.py's
+policy, not the one in .claude/hooks/git-safety-guard.py. The two pattern
+sets differ on purpose (BUG-012): this policy blocks `rm -rf /tmp/x` and
+allows `git branch -D`, `git stash clear`, `git rebase`, `git checkout --`
+and `git push --force`, the hook does the opposite. The shim also reads a
+raw command and prints a verdict dict, not the PreToolUse stdin payload
+and hook output. Use it from scripts that would call git-guard.py.
+
+VERSION: 1.1.1
+
+Usage:
+  git-guard-client.py "rm -rf node_modules"     # exit 0 = allowed, 1 = blocked
+  echo "git clean -fdx" | git-guard-client.py   # command from stdin
+  git-guard-client.py --timing "git status"     # also print round trip to stderr
+  git-guard-client.py --stats                   # server p50/p99 latency
+  git-guard-client.py --socket PATH ...         # non-default socket
+
+Environment:
+  RALPH_GIT_GUARD_SOCKET  Socket path (default: ~/.ralph/run/git-guard.sock)
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+
+DEFAULT_SOCKET = os.environ.get(
+    'RALPH_GIT_GUARD_SOCKET',
+    os.path.join(os.path.expanduser('~'), '.ralph', 'run', 'git-guard.sock'),
+)
+
+# Hooks must not hang on a wedged server; fall back instead
+TIMEOUT_SECONDS = 1.0
+
+
+def query_server(request: dict, socket_path: str = DEFAULT_SOCKET,
+                 timeout: float = TIMEOUT_SECONDS):
+    """
+    Send one request to the guard server.
+
+    Returns:
+        The decoded response dict, or None if the server is unreachable or
+        answered with an error
+    """
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            buffer = b''
+            while not buffer.endswith(b'\n'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    return None
+                buffer += chunk
+    except OSError:
+        return None
+
+    try:
+        response = json.loads(buffer)
+    except ValueError:
+        return None
+    if not isinstance(response, dict) or 'error' in response:
+        return None
+    return response
+
+
+def check_in_process(command: str) -> dict:
+    """Fallback: evaluate the command with scripts/git-guard.py directly."""
+    import importlib.util
+
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'git-guard.py')
+    spec = importlib.util.spec_from_file_location('git_guard', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.GitGuard(cache_size=0).verdict(command)
+
+
+def check_timed(command: str, socket_path: str = DEFAULT_SOCKET) -> tuple[dict, str, float]:
+    """
+    Return the verdict for a command and what it cost this process.
+
+    Returns:
+        Tuple of (verdict, source, round_trip_ms) where source is 'server'
+        or 'in-process' and round_trip_ms covers connect, request and
+        response (or the in-process fallback)
+    """
+    start = time.perf_counter()
+    verdict = query_server({'command': command}, socket_path)
+    source = 'server'
+    if verdict is None:
+        verdict = check_in_process(command)
+        source = 'in-process'
+    return verdict, source, round((time.perf_counter() - start) * 1000, 3)
+
+
+def check(command: str, socket_path: str = DEFAULT_SOCKET) -> dict:
+    """Return the verdict for a command, from the server if available."""
+    return check_timed(command, socket_path)[0]
+
+
+def main(argv=None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    socket_path = DEFAULT_SOCKET
+
+    if '--socket' in args:
+        index = args.index('--socket')
+        if index + 1 >= len(args):
+            print('Error: --socket requires a path', file=sys.stderr)
+            return 2
+        socket_path = args[index + 1]
+        del args[index:index + 2]
+
+    timing = '--timing' in args
+    if timing:
+        args.remove('--timing')
+
+    if args and args[0] in ('-h', '--help'):
+        print(__doc__.strip())
+        return 0
+
+    if args and args[0] == '--stats':
+        start = time.perf_counter()
+        stats = query_server({'op': 'stats'}, socket_path)
+        if stats is None:
+            print(json.dumps({'error': f'no guard server on {socket_path}'}))
+            return 1
+        stats['client_round_trip_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        print(json.dumps(stats))
+        return 0
+
+    command = ' '.join(args) if args else sys.stdin.read().strip()
+    verdict, source, round_trip_ms = check_timed(command, socket_path)
+    print(json.dumps(verdict))
+    if timing:
+        print(json.dumps({'source': source, 'round_trip_ms': round_trip_ms}),
+              file=sys.stderr)
+    return 0 if verdict['safe'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
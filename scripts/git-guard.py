@@ -5,17 +5,29 @@ git-guard.py - Protective Guard for Dangerous Git Commands (Standalone CLI)
 Blocks dangerous commands like 'rm -rf' while allowing specific safe exceptions.
 Only permits: rm -rf .next/ (for Next.js build cleanup)
 
-VERSION: 2.0.1
+VERSION: 2.5.0
 
 BUG-012 NOTE: This is a STANDALONE CLI tool (takes command as argument).
 The HOOK version is at .claude/hooks/git-safety-guard.py (reads JSON from stdin).
 Pattern sets differ intentionally: this tool has .next/ exemption, the hook does not.
 See .claude/hooks/git-safety-guard.py for the hook version used by Claude Code.
+
+SERVER MODE: `git-guard.py --serve` keeps a warm guard on a Unix domain socket;
+scripts/git-guard-client.py is the thin client (falls back to in-process).
+
+BATCH MODE: `git-guard.py --batch FILE|-` audits command histories (plain lines
+or JSONL) in a worker pool and prints one JSONL verdict per command.
 """
 
+from __future__ import annotations
+
+# Only what a single `git-guard.py "<cmd>"` check needs is imported here;
+# the server, batch and cache code import their dependencies on first use.
+import functools
 import os
 import re
 import sys
+import time
 from pathlib import Path
 
 # ANSI color codes
@@ -26,6 +38,304 @@ RESET = '\033[0m'
 BOLD = '\033[1m'
 
 
+# =============================================================================
+# Shell-aware segmentation
+# =============================================================================
+#
+# One left-to-right pass splits a command line into simple commands on &&,
+# ||, ;, |, &, newlines, subshell parentheses, $(...) and backticks. Quotes
+# and backslash escapes are removed shlex-style, so every segment comes back
+# normalized to its words joined by single spaces. $(...) and backticks
+# inside double-quoted strings are segmented too, since the shell runs them;
+# as in bash, their contents are a command line of their own with their own
+# quotes (`"$(echo "a"; rm -rf x)"` is one string holding two commands).
+# An unquoted # at the start of a word begins a comment, dropped up to the
+# next newline as the shell does (`ls # && rm -rf x` is just `ls`).
+# Here-document bodies (<<WORD ... WORD) are data, not commands, and are
+# skipped; an unquoted body is still segmented if it contains $(...) or
+# backticks, since the shell expands those.
+
+_SEGMENT_TOKEN_RE = re.compile(r"""
+    (?P<heredoc><<(?P<strip>-?)[^\S\n]*
+        (?:'(?P<qdelim>[^'\n]*)'|"(?P<dqdelim>[^"\n]*)"|\\?(?P<delim>[^\s;|&()<>`'"\\]+)))
+  | '(?P<squote>[^']*)'?
+  | (?P<dquote>")
+  | (?P<sep>&&|\|\||\$\(|[;|&\n()`])
+  | (?P<space>[^\S\n]+)
+  | \\(?P<escape>.?)
+  | (?P<comment>(?<![^\s;|&()`])\#[^\n]*)
+  | (?P<word>[^\s'"\\;|&()`$]+|\$)
+""", re.VERBOSE | re.DOTALL)
+
+_DQUOTE_ESCAPE_RE = re.compile(r'\\([$`"\\\n])')
+
+# Inside double quotes (or an unquoted here-document body) only escapes, the
+# closing quote and command substitutions matter; inside backticks only the
+# closing backtick
+_EXPANSION_SCAN_RE = re.compile(r'\\.|"|`|\$\(', re.DOTALL)
+_BACKTICK_SCAN_RE = re.compile(r'\\.|`', re.DOTALL)
+
+# Deepest nesting of quoted command substitutions that is segmented
+# ("$(echo "$(...)")"); anything deeper is refused rather than rescanned
+MAX_QUOTE_NESTING = 16
+
+# Without quotes, escapes or heredocs, segments are just the text between separators
+# (and comments)
+_SEGMENT_SPLIT_RE = re.compile(r'&&|\|\||\$\(|[;|&\n()`]|(?<![^\s;|&()`])#[^\n]*')
+
+# Leading VAR=value assignment, skipped like a wrapper (FOO=1 rm -rf x)
+_ASSIGNMENT_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*=')
+
+# Quote and escape characters, dropped before the trigger prescan
+_UNQUOTE_TABLE = str.maketrans('', '', '\'"\\')
+
+
+def _skip_options(words: list[str], index: int, value_options, operands: int) -> int:
+    """
+    Return the index after a command's options and leading operands.
+
+    Args:
+        words: Segment words
+        index: Index of the first word after the command name
+        value_options: Options whose value is the next word
+        operands: Operands between the options and the wrapped command
+    """
+    while index < len(words) and words[index].startswith('-') and words[index] != '-':
+        word = words[index]
+        index += 1
+        if word == '--':
+            break
+        if word in value_options:
+            index += 1
+    return min(index + operands, len(words))
+
+
+def _skip_heredoc(command: str, pos: int, delimiter: str, strip_tabs: bool) -> tuple[int, str]:
+    """
+    Find the end of a here-document body starting at pos.
+
+    Returns:
+        Tuple of (index after the delimiter line, body text); an unterminated
+        body runs to the end of the command
+    """
+    start = pos
+    while pos < len(command):
+        end = command.find('\n', pos)
+        if end == -1:
+            end = len(command)
+        line = command[pos:end]
+        if (line.lstrip('\t') if strip_tabs else line) == delimiter:
+            return min(end + 1, len(command)), command[start:pos]
+        pos = end + 1
+    return len(command), command[start:]
+
+
+class ShellNestingError(ValueError):
+    """Raised when commands nest deeper than the guard inspects."""
+
+
+def _heredoc_spec(match) -> tuple[bool, str, bool]:
+    """Return (strip_tabs, delimiter, quoted) for a heredoc token match."""
+    delimiter = match.group('delim')
+    # <<'EOF', <<"EOF" and <<\EOF bodies are not expanded
+    quoted = delimiter is None or match.group().endswith('\\' + delimiter)
+    if delimiter is None:
+        delimiter = match.group('qdelim')
+        if delimiter is None:
+            delimiter = match.group('dqdelim')
+    return match.group('strip') == '-', delimiter, quoted
+
+
+def _scan_expansions(command: str, pos: int, quoted: bool = True) -> tuple[int, list]:
+    """
+    Find the end of double-quoted text and the command substitutions in it.
+
+    A $(...) inside the text is lexed as an unquoted command line, with
+    its own quotes, parentheses and here-documents, up to its matching
+    `)`; a backquoted command runs to the next unescaped backtick. The
+    text ends at the first `"` outside all of them. Iterative, so deep
+    nesting costs no recursion.
+
+    Args:
+        command: Command line
+        pos: Index just after the opening quote
+        quoted: False for an unquoted here-document body, which has no
+            closing quote
+
+    Returns:
+        Tuple of (index of the closing quote, or len(command) if there is
+        none, list of (start, end) spans of the outermost $(...) and
+        `...` in the text, delimiters included)
+    """
+    spans = []
+    # Open contexts, innermost last: ['"'] double quotes, ['`'] backticks,
+    # ['$(', paren depth, pending heredocs] command substitution
+    stack = [['"' if quoted else '<<']]
+    start = 0
+    length = len(command)
+
+    while pos < length:
+        frame = stack[-1]
+        depth = len(stack)
+        if frame[0] == '$(':
+            match = _SEGMENT_TOKEN_RE.match(command, pos)
+            kind = match.lastgroup
+            token = match.group()
+            if kind == 'dquote':
+                stack.append(['"'])
+            elif kind == 'heredoc':
+                strip_tabs, delimiter, _ = _heredoc_spec(match)
+                frame[2].append((strip_tabs, delimiter))
+            elif kind == 'sep':
+                if token in ('(', '$('):
+                    frame[1] += 1
+                elif token == ')':
+                    frame[1] -= 1
+                    if frame[1] == 0:
+                        stack.pop()
+                elif token == '`':
+                    stack.append(['`'])
+                elif token == '\n' and frame[2]:
+                    end = match.end()
+                    for strip_tabs, delimiter in frame[2]:
+                        end, _ = _skip_heredoc(command, end, delimiter, strip_tabs)
+                    frame[2] = []
+                    match = None
+                    pos = end
+            if match is not None:
+                pos = match.end()
+        else:
+            scan = _BACKTICK_SCAN_RE if frame[0] == '`' else _EXPANSION_SCAN_RE
+            match = scan.search(command, pos)
+            if match is None:
+                pos = length
+                break
+            pos = match.end()
+            token = match.group()
+            if token == '`':
+                if frame[0] == '`':
+                    stack.pop()
+                else:
+                    stack.append(['`'])
+            elif token == '$(':
+                stack.append(['$(', 1, []])
+            elif token == '"' and frame[0] == '"':
+                stack.pop()
+                if not stack:
+                    return pos - 1, spans
+
+        if depth == 1 and len(stack) == 2:
+            start = match.start()
+        elif depth == 2 and len(stack) == 1:
+            spans.append((start, pos))
+
+    if len(stack) > 1:
+        spans.append((start, length))  # unterminated substitution
+    return length, spans
+
+
+def iter_segments(command: str, _depth: int = 0):
+    """
+    Yield the normalized simple-command segments of a shell command line.
+
+    Runs in time linear in len(command) for each level of quoted command
+    substitution, and yields as it goes, so a caller looking for the first
+    interesting segment stops scanning there. Unbalanced quotes are
+    treated as running to the end of the string instead of raising like
+    shlex does.
+
+    Args:
+        command: Raw command line
+
+    Yields:
+        Segments, each its words joined by single spaces
+
+    Raises:
+        ShellNestingError: If quoted command substitutions nest deeper
+            than MAX_QUOTE_NESTING
+    """
+    if _depth > MAX_QUOTE_NESTING:
+        raise ShellNestingError(
+            f"Quoted command substitutions nested more than "
+            f"{MAX_QUOTE_NESTING} levels deep")
+    if ('"' not in command and "'" not in command and '\\' not in command
+            and '<<' not in command):
+        start = 0
+        for match in _SEGMENT_SPLIT_RE.finditer(command):
+            part = command[start:match.start()]
+            start = match.end()
+            if part and not part.isspace():
+                yield ' '.join(part.split())
+        part = command[start:]
+        if part and not part.isspace():
+            yield ' '.join(part.split())
+        return
+
+    words = []
+    word = []
+    heredocs = []  # (strip_tabs, delimiter, quoted) waiting for the next newline
+    pos = 0
+
+    while pos < len(command):
+        match = _SEGMENT_TOKEN_RE.match(command, pos)
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == 'heredoc':
+            heredocs.append(_heredoc_spec(match))
+        elif kind == 'word' or kind == 'squote':
+            word.append(match.group(kind))
+        elif kind == 'dquote':
+            end, spans = _scan_expansions(command, pos)
+            body = command[pos:end]
+            pos = end + 1
+            for start, stop in spans:
+                yield from iter_segments(command[start:stop], _depth + 1)
+            if '\\' in body:
+                body = _DQUOTE_ESCAPE_RE.sub(
+                    lambda m: '' if m.group(1) == '\n' else m.group(1), body)
+            word.append(body)
+        elif kind == 'escape':
+            if match.group(kind) != '\n':  # backslash-newline continues the line
+                word.append(match.group(kind))
+        else:
+            # space, comment or separator: the current word ends here
+            if word:
+                text = ''.join(word)
+                if text:
+                    words.append(text)
+                word = []
+            if kind == 'sep' and words:
+                yield ' '.join(words)
+                words = []
+            if heredocs and match.group() == '\n':
+                for strip_tabs, delimiter, quoted in heredocs:
+                    pos, body = _skip_heredoc(command, pos, delimiter, strip_tabs)
+                    if not quoted and ('$(' in body or '`' in body):
+                        for start, stop in _scan_expansions(body, 0, quoted=False)[1]:
+                            yield from iter_segments(body[start:stop], _depth + 1)
+                heredocs = []
+
+    if word:
+        text = ''.join(word)
+        if text:
+            words.append(text)
+    if words:
+        yield ' '.join(words)
+
+
+def segment_command(command: str) -> list[str]:
+    """
+    Split a shell command line into normalized simple-command segments.
+
+    Args:
+        command: Raw command line
+
+    Returns:
+        List of segments, each its words joined by single spaces
+    """
+    return list(iter_segments(command))
+
+
 class GitGuard:
     """
     Git guard that blocks dangerous commands before execution.
@@ -94,16 +404,140 @@ class GitGuard:
     # Command prefix that triggers guard
     TRIGGER_PREFIXES = ['rm ', 'rm -rf', 'rm -r', 'git clean', 'git reset']
 
-    def __init__(self, allow_mode: bool = False):
+    # Leading words skipped before a segment is compared with TRIGGER_PREFIXES:
+    # shell reserved words that run the rest of the segment, and wrapper
+    # commands that exec their arguments (VAR=x assignments are skipped too)
+    SHELL_RESERVED_WORDS = ['{', '!', 'if', 'then', 'elif', 'else', 'while', 'until', 'do']
+
+    # Command/argument table for wrappers: options that take a value (so
+    # `sudo -u root rm` skips `root`) and operands before the wrapped
+    # command (`timeout 5 rm`). Other words starting with '-' are flags.
+    WRAPPER_COMMANDS = {
+        'sudo': (['-u', '-g', '-C', '-D', '-h', '-p', '-r', '-t', '-T', '-U',
+                  '--user', '--group', '--close-from', '--chdir', '--host',
+                  '--prompt', '--role', '--type', '--command-timeout',
+                  '--other-user'], 0),
+        'doas': (['-u', '-C'], 0),
+        'env': (['-u', '-C', '--unset', '--chdir'], 0),
+        'time': (['-f', '-o', '--format', '--output'], 0),
+        'nohup': ([], 0),
+        'nice': (['-n', '--adjustment'], 0),
+        'ionice': (['-c', '-n', '-p', '-P', '-u', '--class', '--classdata'], 0),
+        'timeout': (['-s', '-k', '--signal', '--kill-after'], 1),
+        'stdbuf': (['-i', '-o', '-e', '--input', '--output', '--error'], 0),
+        'command': ([], 0),
+        'exec': (['-a'], 0),
+        'xargs': (['-I', '-n', '-P', '-d', '-E', '-L', '-s', '-a', '--replace',
+                   '--max-args', '--max-procs', '--delimiter', '--eof',
+                   '--max-lines', '--max-chars', '--arg-file'], 0),
+    }
+
+    # Wrappers that append arguments of their own to the wrapped command
+    # (`ls | xargs rm -rf .next/` removes every listed path), so a segment
+    # run through one is never ALLOWED_EXACT
+    ARGUMENT_WRAPPERS = ['xargs']
+
+    # Options a command accepts before its subcommand, removed so the
+    # segment matches TRIGGER_PREFIXES (`git -C repo reset` -> `git reset`)
+    GLOBAL_OPTIONS = {
+        'git': ['-C', '-c', '--git-dir', '--work-tree', '--namespace', '--config-env'],
+    }
+
+    # Shells whose `-c` argument (and eval, whose arguments) are a command
+    # line of their own, checked again from the start
+    SHELL_COMMANDS = ['sh', 'bash', 'zsh', 'dash', 'ksh']
+    SHELL_VALUE_OPTIONS = ['-o', '-O', '+o', '+O', '--rcfile', '--init-file']
+
+    # Deepest chain of nested sh -c/eval scripts that is inspected; anything
+    # deeper is blocked rather than rescanned level after level
+    MAX_SHELL_NESTING = 16
+
+    # Single-pass matcher over BLOCKED_PATTERNS (built once, see _compile_blocked)
+    _BLOCKED_RE = None
+    _BLOCKED_COMPILED = ()
+
+    # Command table for segments: first word -> TRIGGER_PREFIXES starting with it
+    _TRIGGER_TABLE = None
+    _TRIGGER_SCANS = ()
+    _RESERVED_WORDS = frozenset()
+    _WRAPPER_TABLE = {}
+    _ARGUMENT_WRAPPERS = frozenset()
+    _GLOBAL_OPTION_TABLE = {}
+    _SHELLS = frozenset()
+    _PREFIX_WORDS = frozenset()
+
+    # Decision cache: entries kept, and longest command worth caching.
+    # Processes share it only through the guard server (--serve); the
+    # PreToolUse hook keeps its own policy and does not use this cache.
+    CACHE_SIZE = 1024
+    CACHE_MAX_COMMAND_LENGTH = 4096
+
+    def __init__(self, allow_mode: bool = False, cache_size: int | None = None):
         """
         Initialize the guard.
 
         Args:
             allow_mode: If True, allow all commands (testing mode)
+            cache_size: Decision cache entries (default CACHE_SIZE, 0 disables)
         """
         self.allow_mode = allow_mode
         self.blocked_count = 0
         self.allowed_count = 0
+        self._policy_version = None
+
+        # Agents re-issue the same commands constantly; remember decisions
+        # per (policy version, normalized command) in a bounded LRU
+        if cache_size is None:
+            cache_size = self.CACHE_SIZE
+        if cache_size > 0:
+            self._decide_cached = functools.lru_cache(maxsize=cache_size)(self._decide)
+        else:
+            self._decide_cached = None
+
+    @classmethod
+    def compute_policy_version(cls) -> str:
+        """
+        Hash of the rules that decide a verdict.
+
+        Part of every cache key, so a cache shared with a guard running a
+        different pattern set can never return a stale decision.
+        """
+        import hashlib
+
+        policy = repr([cls.BLOCKED_PATTERNS, cls.ALLOWED_EXACT, cls.TRIGGER_PREFIXES,
+                       cls.SHELL_RESERVED_WORDS, cls.WRAPPER_COMMANDS,
+                       cls.ARGUMENT_WRAPPERS, cls.GLOBAL_OPTIONS, cls.SHELL_COMMANDS,
+                       cls.SHELL_VALUE_OPTIONS, cls.MAX_SHELL_NESTING])
+        return hashlib.sha256(policy.encode('utf-8')).hexdigest()[:12]
+
+    @property
+    def policy_version(self) -> str:
+        """compute_policy_version(), hashed on first use by the cache."""
+        if self._policy_version is None:
+            self._policy_version = self.compute_policy_version()
+        return self._policy_version
+
+    def cache_info(self) -> dict:
+        """
+        Report decision cache effectiveness.
+
+        Returns:
+            Dict with policy_version, hits, misses, size, maxsize and hit_rate
+        """
+        if self._decide_cached is None:
+            hits = misses = size = maxsize = 0
+        else:
+            info = self._decide_cached.cache_info()
+            hits, misses, size, maxsize = info.hits, info.misses, info.currsize, info.maxsize
+        lookups = hits + misses
+        return {
+            "policy_version": self.policy_version,
+            "hits": hits,
+            "misses": misses,
+            "size": size,
+            "maxsize": maxsize,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
 
     def check_command(self, command: str) -> tuple[bool, str]:
         """
@@ -115,38 +549,359 @@ class GitGuard:
         Returns:
             Tuple of (is_safe, message)
         """
+        is_safe, message, _ = self.evaluate(command)
+        return is_safe, message
+
+    def evaluate(self, command: str) -> tuple[bool, str, str | None]:
+        """
+        Check a command and report which blocked pattern matched.
+
+        Args:
+            command: The command string to check
+
+        Returns:
+            Tuple of (is_safe, message, matched_pattern or None)
+        """
         if self.allow_mode:
-            return True, "Allow mode enabled"
+            return True, "Allow mode enabled", None
 
         # Normalize command
         normalized = command.strip()
 
-        # Check for trigger prefixes first (fast pre-filter)
-        trigger_found = False
-        for prefix in self.TRIGGER_PREFIXES:
-            if normalized.startswith(prefix):
-                trigger_found = True
-                break
+        if (self._decide_cached is not None
+                and len(normalized) <= self.CACHE_MAX_COMMAND_LENGTH):
+            is_safe, message, pattern, counter = self._decide_cached(
+                self.policy_version, normalized)
+        else:
+            is_safe, message, pattern, counter = self._decide(None, normalized)
+
+        # Counters track decisions, so cache hits count too
+        if counter == 'allowed':
+            self.allowed_count += 1
+        elif counter == 'blocked':
+            self.blocked_count += 1
+        return is_safe, message, pattern
 
-        if not trigger_found:
-            return True, "No dangerous trigger found"
+    def _decide(self, policy_version: str | None, normalized: str) -> tuple:
+        """
+        Uncached decision for a normalized command.
+
+        policy_version is unused here; it only makes the cache key (None
+        when the decision is not cached).
 
+        Returns:
+            Tuple of (is_safe, message, pattern, counter) where counter is
+            'allowed', 'blocked' or None
+        """
         # Check for ALLOWED EXACT command FIRST
         # This must be an EXACT match (case-sensitive, no extra spaces)
         if normalized == self.ALLOWED_EXACT:
-            self.allowed_count += 1
-            return True, f"Allowed: {self.ALLOWED_EXACT}"
+            return True, f"Allowed: {self.ALLOWED_EXACT}", None, 'allowed'
+
+        # A command starting with a trigger is scanned as a whole, so the
+        # chained-command patterns still apply to it. That includes a
+        # leading `rm -rf .next/`: `rm -rf .next/ && npm run build` is
+        # blocked by rm\s+-rf\s+\. as before segmentation, while the same
+        # segment later in a chain is exempt (see find_trigger_segment).
+        if not normalized.startswith(tuple(self.TRIGGER_PREFIXES)):
+            # Otherwise a trigger can only hide in a later segment
+            # (cd x && rm -rf y, $(...), subshells, quoted words)
+            try:
+                normalized, exempted = self._find_trigger(normalized)
+            except ShellNestingError as e:
+                return False, f"BLOCKED: {e}", None, 'blocked'
+            if normalized is None:
+                if exempted:
+                    return True, f"Allowed: {self.ALLOWED_EXACT}", None, 'allowed'
+                return True, "No dangerous trigger found", None, None
 
         # Check for blocked patterns
-        for pattern in self.BLOCKED_PATTERNS:
-            if re.search(pattern, normalized, re.IGNORECASE):
-                self.blocked_count += 1
-                return False, f"BLOCKED: Dangerous pattern '{pattern}' detected"
+        pattern = self.match_blocked(normalized)
+        if pattern is not None:
+            return (False, f"BLOCKED: Dangerous pattern '{pattern}' detected",
+                    pattern, 'blocked')
 
         # If we got here, it starts with a trigger but doesn't match any block pattern
         # This is still suspicious - block it
-        self.blocked_count += 1
-        return False, f"BLOCKED: Suspicious command pattern detected"
+        return False, f"BLOCKED: Suspicious command pattern detected", None, 'blocked'
+
+    def find_trigger_segment(self, command: str) -> str | None:
+        """
+        Return the first segment of a command line that starts with a trigger.
+
+        Segments equal to ALLOWED_EXACT are exempt, as the whole command
+        would be, so `cd web && rm -rf .next/ && npm run build` passes while
+        `cd web && rm -rf .next/ && rm -rf dist` returns `rm -rf dist`.
+        A segment run through an ARGUMENT_WRAPPERS entry is not exempt
+        (`ls | xargs rm -rf .next/` removes more than .next/). The guard
+        only calls this for commands that do not start with a trigger;
+        those keep the whole-line scan, exemption or not.
+
+        Each segment from iter_segments() is classified once: leading
+        reserved words, wrappers and assignments are skipped (see
+        strip_command_prefix), `sh -c`/`bash -c`/`eval` scripts are checked
+        as command lines of their own, the first remaining word is looked
+        up in the trigger table, and only then compared with
+        TRIGGER_PREFIXES.
+
+        Args:
+            command: The command string to check
+
+        Returns:
+            The normalized segment (without skipped prefix words), or None if
+            no segment is a trigger
+
+        Raises:
+            ShellNestingError: If sh -c/eval scripts nest deeper than
+                MAX_SHELL_NESTING (`eval eval ... rm -rf x`), or quoted
+                command substitutions deeper than MAX_QUOTE_NESTING
+        """
+        return self._find_trigger(command)[0]
+
+    def _find_trigger(self, command: str) -> tuple[str | None, bool]:
+        """
+        find_trigger_segment(), also reporting whether a segment was exempt.
+
+        Returns:
+            Tuple of (trigger segment or None, whether an ALLOWED_EXACT
+            segment was skipped on the way)
+        """
+        if type(self).__dict__.get('_TRIGGER_TABLE') is None:
+            type(self)._build_command_table()
+        table = self._TRIGGER_TABLE
+
+        if not self._may_contain_trigger(command):
+            return None, False
+
+        # One segment iterator per nested script, innermost last. Segments
+        # are produced lazily; scanning stops at the first trigger.
+        exempted = False
+        stack = [iter_segments(command)]
+        while stack:
+            for segment in stack[-1]:
+                first = segment.split(' ', 1)[0]
+                exemptable = True
+                if first in self._PREFIX_WORDS or '=' in first:
+                    stripped = self.strip_command_prefix(segment)
+                    if not self._ARGUMENT_WRAPPERS.isdisjoint(
+                            segment[:len(segment) - len(stripped)].split(' ')):
+                        exemptable = False
+                    segment = stripped
+                    first = segment.split(' ', 1)[0]
+                    if first in self._SHELLS:
+                        script = self.shell_script(segment)
+                        if script is not None:
+                            if not self._may_contain_trigger(script):
+                                continue
+                            if len(stack) > self.MAX_SHELL_NESTING:
+                                raise ShellNestingError(
+                                    f"Shell scripts nested more than "
+                                    f"{self.MAX_SHELL_NESTING} levels deep")
+                            stack.append(iter_segments(script))
+                            break
+                prefixes = table.get(first)
+                if prefixes and segment.startswith(prefixes):
+                    if segment != self.ALLOWED_EXACT or not exemptable:
+                        return segment, exempted
+                    exempted = True
+            else:
+                stack.pop()
+        return None, exempted
+
+    def _may_contain_trigger(self, command: str) -> bool:
+        """
+        Prescan for find_trigger_segment().
+
+        A segment can only start with a trigger if the trigger's text occurs
+        somewhere once quotes and escapes are taken out (r'm' -rf, "git"
+        clean). Most long command lines are ruled out here.
+        """
+        if '"' in command or "'" in command or '\\' in command:
+            command = command.replace('\\\n', '').translate(_UNQUOTE_TABLE)
+        return any(scan.search(command) for scan in self._TRIGGER_SCANS)
+
+    @classmethod
+    def _build_command_table(cls) -> None:
+        """Build the trigger table, trigger prescan and prefix word sets (per class)."""
+        table = {}
+        for prefix in cls.TRIGGER_PREFIXES:
+            table.setdefault(prefix.split(' ', 1)[0], []).append(prefix)
+        # One regex per first word: each starts with a literal (rm, git),
+        # which the regex engine searches for far faster than an alternation.
+        # A command with global options may also be followed by an option.
+        scans = []
+        for first, prefixes in table.items():
+            alternatives = [
+                r'\s+'.join(re.escape(word) for word in prefix.split(' '))
+                for prefix in prefixes
+            ]
+            if first in cls.GLOBAL_OPTIONS:
+                alternatives.append(re.escape(first) + r'\s+-')
+            scans.append(re.compile('|'.join(alternatives)))
+        cls._TRIGGER_SCANS = tuple(scans)
+
+        cls._RESERVED_WORDS = frozenset(cls.SHELL_RESERVED_WORDS)
+        cls._WRAPPER_TABLE = {
+            name: (frozenset(options), operands)
+            for name, (options, operands) in cls.WRAPPER_COMMANDS.items()
+        }
+        cls._ARGUMENT_WRAPPERS = frozenset(cls.ARGUMENT_WRAPPERS)
+        cls._GLOBAL_OPTION_TABLE = {
+            name: frozenset(options) for name, options in cls.GLOBAL_OPTIONS.items()
+        }
+        cls._SHELLS = frozenset(cls.SHELL_COMMANDS + ['eval'])
+        cls._PREFIX_WORDS = (cls._RESERVED_WORDS | frozenset(cls._WRAPPER_TABLE)
+                             | frozenset(cls._GLOBAL_OPTION_TABLE) | cls._SHELLS)
+        cls._TRIGGER_TABLE = {word: tuple(prefixes) for word, prefixes in table.items()}
+
+    def strip_command_prefix(self, segment: str) -> str:
+        """
+        Drop the words before the command a segment actually runs.
+
+        `{ rm -rf x`, `then rm -rf x`, `sudo -u root env X=1 nohup rm -rf x`,
+        `timeout 5 rm -rf x` and `xargs -I {} rm -rf {}` all run rm; wrapper
+        options and operands are skipped per WRAPPER_COMMANDS. Global
+        options are removed too (`git -C repo reset` -> `git reset`).
+
+        Args:
+            segment: A normalized segment from segment_command()
+
+        Returns:
+            The segment starting at the command it runs
+        """
+        if type(self).__dict__.get('_TRIGGER_TABLE') is None:
+            type(self)._build_command_table()
+
+        words = segment.split(' ')
+        index = 0
+        while index < len(words):
+            word = words[index]
+            if word in self._RESERVED_WORDS or _ASSIGNMENT_RE.match(word):
+                index += 1
+                continue
+            spec = self._WRAPPER_TABLE.get(word)
+            if spec is None:
+                break
+            index = _skip_options(words, index + 1, *spec)
+        words = words[index:]
+
+        value_options = self._GLOBAL_OPTION_TABLE.get(words[0]) if words else None
+        if value_options is not None:
+            words = words[:1] + words[_skip_options(words, 1, value_options, 0):]
+        return ' '.join(words)
+
+    def shell_script(self, segment: str) -> str | None:
+        """
+        Return the command line a shell segment runs, if it is inline.
+
+        Args:
+            segment: A segment starting with a SHELL_COMMANDS entry or eval
+
+        Returns:
+            The `-c` argument (`bash -lc 'rm -rf x'` -> `rm -rf x`) or eval's
+            arguments, or None when the shell runs a script file or stdin
+        """
+        words = segment.split(' ')
+        if words[0] == 'eval':
+            return ' '.join(words[1:]) or None
+        index = 1
+        while index < len(words):
+            word = words[index]
+            if not word or word[0] not in '-+' or word in ('-', '--'):
+                return None
+            index += 1
+            if word in self.SHELL_VALUE_OPTIONS:
+                index += 1
+            elif not word.startswith('--') and 'c' in word[1:]:
+                return ' '.join(words[index:]) or None
+        return None
+
+    def verdict(self, command: str) -> dict:
+        """
+        Check a command and return the JSON-serializable verdict.
+
+        This is the wire format shared by --json, the guard server and the
+        client shim, so all three produce identical output.
+
+        Args:
+            command: The command string to check
+
+        Returns:
+            Dict with command, safe, message and pattern keys
+        """
+        is_safe, message, pattern = self.evaluate(command)
+        return {
+            "command": command,
+            "safe": is_safe,
+            "message": message,
+            "pattern": pattern,
+        }
+
+    @classmethod
+    def _compile_blocked(cls) -> None:
+        """
+        Build the single-pass matcher for BLOCKED_PATTERNS.
+
+        All patterns are joined into one alternation of named groups
+        (p0, p1, ...) so a command is scanned once instead of once per
+        pattern. A lookahead on the patterns' leading characters lets the
+        regex engine skip positions that cannot start any match. The
+        per-pattern compiled list is kept to attribute the match to the
+        same pattern the sequential scan would report.
+        """
+        cls._BLOCKED_COMPILED = tuple(
+            re.compile(pattern, re.IGNORECASE) for pattern in cls.BLOCKED_PATTERNS
+        )
+        alternation = '|'.join(
+            f'(?P<p{index}>{pattern})'
+            for index, pattern in enumerate(cls.BLOCKED_PATTERNS)
+        )
+
+        # Prefilter on the first literal character of each pattern; any
+        # pattern starting with a metacharacter disables it.
+        first_chars = set()
+        for pattern in cls.BLOCKED_PATTERNS:
+            if pattern.startswith('\\') and len(pattern) > 1 and not pattern[1].isalnum():
+                first_chars.add(pattern[1])
+            elif pattern and (pattern[0].isalnum() or pattern[0] in '&;_-/@'):
+                first_chars.update({pattern[0].lower(), pattern[0].upper()})
+            else:
+                first_chars = None
+                break
+
+        if first_chars:
+            charset = ''.join(re.escape(char) for char in sorted(first_chars))
+            alternation = f'(?=[{charset}])(?:{alternation})'
+
+        cls._BLOCKED_RE = re.compile(alternation, re.IGNORECASE)
+
+    def match_blocked(self, command: str) -> str | None:
+        """
+        Return the first BLOCKED_PATTERNS entry matching a command.
+
+        Args:
+            command: The normalized command string
+
+        Returns:
+            The matching pattern (in BLOCKED_PATTERNS order), or None
+        """
+        # Compiled per class, so subclasses overriding BLOCKED_PATTERNS
+        # never reuse the parent's matcher
+        if type(self).__dict__.get('_BLOCKED_RE') is None:
+            type(self)._compile_blocked()
+
+        match = self._BLOCKED_RE.search(command)
+        if match is None:
+            return None
+
+        # The alternation reports the leftmost match. Earlier patterns in
+        # the list already failed at and before that position, but one may
+        # still match further right - and the sequential scan would pick it.
+        index = int(match.lastgroup[1:])
+        for earlier in range(index):
+            if self._BLOCKED_COMPILED[earlier].search(command, match.start() + 1):
+                return self.BLOCKED_PATTERNS[earlier]
+        return self.BLOCKED_PATTERNS[index]
 
     def guard(self, command: str) -> bool:
         """
@@ -207,6 +962,353 @@ class GitGuard:
         return blocked
 
 
+# =============================================================================
+# Guard server: long-lived process on a Unix domain socket
+# =============================================================================
+#
+# Each git-guard.py call otherwise pays Python startup plus pattern
+# compilation. The server keeps one warm GitGuard; scripts/git-guard-client.py
+# sends it one JSON request per line and falls back to in-process checking
+# when the socket is absent. It serves this CLI's policy, not the PreToolUse
+# hook's (see BUG-012 above), so the hook cannot delegate to it.
+#
+# Protocol (newline-delimited JSON):
+#   {"command": "rm -rf dist"}  -> GitGuard.verdict() dict
+#   {"op": "stats"}             -> call counts and p50/p99 latency
+
+DEFAULT_SOCKET = Path(os.environ.get(
+    'RALPH_GIT_GUARD_SOCKET',
+    str(Path.home() / '.ralph' / 'run' / 'git-guard.sock'),
+))
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest-rank percentile of samples (0.0 when empty)."""
+    import math
+
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class GuardServer:
+    """
+    Long-lived guard serving GitGuard verdicts over a Unix domain socket.
+
+    Decisions come from the same GitGuard.verdict() the CLI uses, so
+    answers are identical to in-process checks. Per-call latency (request
+    read to response written) is kept in a bounded window for p50/p99
+    reporting.
+
+    Wraps a threading socketserver.UnixStreamServer, built in __init__ so
+    single-command runs of this script never import the server modules.
+    """
+
+    def __init__(self, socket_path: Path, guard: GitGuard | None = None,
+                 max_samples: int = 10000):
+        """
+        Bind the socket (owner-only permissions).
+
+        A leftover socket from a previous server is replaced; any other
+        file at socket_path is left alone.
+
+        Args:
+            socket_path: Path of the Unix domain socket
+            guard: GitGuard instance to serve (default: new GitGuard)
+            max_samples: Size of the latency window
+
+        Raises:
+            ValueError: If guard is in allow mode
+            FileExistsError: If socket_path exists and is not a socket
+        """
+        import json
+        import socketserver
+        import stat
+        import threading
+        from collections import deque
+
+        self.socket_path = Path(socket_path)
+        self.guard = guard or GitGuard()
+        # The socket is shared by every script and teammate using it; a testing
+        # flag here would silently turn the guard off for all of them
+        if self.guard.allow_mode:
+            raise ValueError("the guard server cannot run in allow mode")
+        self.latencies_ms = deque(maxlen=max_samples)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+        # Compile the matcher before the first request arrives
+        self.guard.match_blocked('')
+
+        guard_server = self
+
+        class RequestHandler(socketserver.StreamRequestHandler):
+            """Answer newline-delimited JSON requests on one connection."""
+
+            def handle(self):
+                for line in self.rfile:
+                    # Timed from the request line being read to the response
+                    # being written, i.e. the whole call as the client sees it
+                    start = time.perf_counter()
+                    if not line.strip():
+                        continue
+                    try:
+                        response = guard_server.handle_request(line)
+                    except (ValueError, TypeError) as e:
+                        response = {"error": f"invalid request: {e}"}
+                    self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                    self.wfile.flush()
+                    if 'safe' in response:  # verdicts only, not stats or errors
+                        guard_server.record_latency(time.perf_counter() - start)
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self.socket_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Replace a stale socket, but never delete anything else at that path
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{self.socket_path} exists and is not a socket")
+            self.socket_path.unlink()
+        old_umask = os.umask(0o077)
+        try:
+            self._server = Server(str(self.socket_path), RequestHandler)
+        finally:
+            os.umask(old_umask)
+
+    def handle_request(self, line: bytes) -> dict:
+        """
+        Evaluate one JSON request line.
+
+        Raises:
+            ValueError: If the line is not a JSON object
+        """
+        import json
+
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("expected a JSON object")
+
+        if request.get('op') == 'stats':
+            return self.stats()
+
+        command = request.get('command')
+        if not isinstance(command, str):
+            raise ValueError("'command' must be a string")
+
+        with self._lock:
+            verdict = self.guard.verdict(command)
+            self.calls += 1
+        return verdict
+
+    def record_latency(self, seconds: float) -> None:
+        """Add one answered call to the p50/p99 latency window."""
+        with self._lock:
+            self.latencies_ms.append(seconds * 1000)
+
+    def stats(self) -> dict:
+        """Return call counts, p50/p99 latency in milliseconds and cache hits."""
+        with self._lock:
+            samples = list(self.latencies_ms)
+            calls = self.calls
+            blocked = self.guard.blocked_count
+            allowed = self.guard.allowed_count
+            cache = self.guard.cache_info()
+        return {
+            "calls": calls,
+            "blocked_count": blocked,
+            "allowed_count": allowed,
+            "p50_ms": round(percentile(samples, 50), 4),
+            "p99_ms": round(percentile(samples, 99), 4),
+            "cache": cache,
+        }
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        self._server.serve_forever(poll_interval)
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+
+    def server_close(self) -> None:
+        self._server.server_close()
+        try:
+            self.socket_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def socket_alive(socket_path: Path) -> bool:
+    """Return True if a guard server is accepting on socket_path."""
+    import socket
+
+    if not Path(socket_path).exists():
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def serve(socket_path: Path, quiet: bool = False) -> None:
+    """Run the guard server until SIGINT/SIGTERM."""
+    import signal
+
+    if socket_alive(socket_path):
+        print(f"{RED}Error: guard server already running on {socket_path}{RESET}")
+        sys.exit(1)
+
+    try:
+        server = GuardServer(socket_path, GitGuard())
+    except FileExistsError as e:
+        print(f"{RED}Error: {e}{RESET}")
+        sys.exit(1)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    if not quiet:
+        print(f"{GREEN}git-guard server listening on {socket_path}{RESET}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# =============================================================================
+# Batch mode: audit command histories in bulk
+# =============================================================================
+#
+# Streams commands (plain lines or JSONL records) through a worker pool and
+# writes one JSONL verdict per command, in input order, with running totals.
+
+BATCH_CHUNKSIZE = 1000
+
+# Per-worker guard, created by _init_batch_worker
+_batch_guard = None
+
+
+def parse_batch_line(line: str) -> str | None:
+    """
+    Extract the command from one batch input line.
+
+    JSONL records may carry the command as "command" or, for hook and trace
+    payloads, as tool_input.command. Anything else is a plain command line.
+
+    Returns:
+        The command, or None for blank lines and records without a command
+    """
+    stripped = line.strip()
+    if not stripped:
+        return None
+    if stripped.startswith('{'):
+        import json
+
+        try:
+            record = json.loads(stripped)
+        except ValueError:
+            return stripped
+        if isinstance(record, dict):
+            command = record.get('command')
+            if command is None and isinstance(record.get('tool_input'), dict):
+                command = record['tool_input'].get('command')
+            return command if isinstance(command, str) else None
+    return stripped
+
+
+def _init_batch_worker(allow_mode: bool) -> None:
+    global _batch_guard
+    _batch_guard = GitGuard(allow_mode=allow_mode)
+
+
+def _batch_verdict(item: tuple[int, str]) -> dict:
+    line_number, command = item
+    verdict = _batch_guard.verdict(command)
+    verdict["line"] = line_number
+    return verdict
+
+
+def run_batch(lines, output, workers: int = 1, allow_mode: bool = False) -> dict:
+    """
+    Evaluate a stream of commands and write JSONL verdicts.
+
+    Each output record is GitGuard.verdict() plus the input line number and
+    running blocked_count/safe_count totals over the batch. safe_count is
+    every safe verdict, unlike GitGuard.allowed_count (ALLOWED_EXACT hits).
+
+    Args:
+        lines: Iterable of input lines (plain commands or JSONL records)
+        output: Text stream for the JSONL verdicts
+        workers: Worker processes (1 evaluates in-process)
+        allow_mode: Passed to every worker's GitGuard
+
+    Returns:
+        Summary dict with total, blocked_count, safe_count, skipped, seconds
+    """
+    import json
+
+    start = time.perf_counter()
+    skipped = 0
+
+    # (line number, command) pairs travel through the pool together, so
+    # nothing per line is kept here and memory stays bounded when streaming
+    def commands():
+        nonlocal skipped
+        for line_number, line in enumerate(lines, 1):
+            command = parse_batch_line(line)
+            if command is None:
+                skipped += 1
+                continue
+            yield line_number, command
+
+    pool = None
+    if workers > 1:
+        import multiprocessing
+
+        pool = multiprocessing.Pool(
+            workers, initializer=_init_batch_worker, initargs=(allow_mode,))
+        verdicts = pool.imap(_batch_verdict, commands(), chunksize=BATCH_CHUNKSIZE)
+    else:
+        _init_batch_worker(allow_mode)
+        verdicts = map(_batch_verdict, commands())
+
+    blocked = safe = 0
+    finished = False
+    try:
+        for verdict in verdicts:
+            if verdict["safe"]:
+                safe += 1
+            else:
+                blocked += 1
+            verdict["blocked_count"] = blocked
+            verdict["safe_count"] = safe
+            output.write(json.dumps(verdict) + '\n')
+        finished = True
+    finally:
+        if pool is not None:
+            # On error (e.g. BrokenPipeError from `| head`) drop queued work
+            if finished:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
+
+    return {
+        "total": blocked + safe,
+        "blocked_count": blocked,
+        "safe_count": safe,
+        "skipped": skipped,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
 def main():
     """Main entry point for git-guard."""
     import argparse
@@ -225,6 +1327,16 @@ Examples:
   {GREEN}# Allow mode (for testing){RESET}
   git-guard --allow "rm -rf .next/"
 
+  {GREEN}# JSON verdict (same format as the guard server){RESET}
+  git-guard --json "git clean -fdx"
+
+  {GREEN}# Audit a command history (plain lines or JSONL) -> JSONL verdicts{RESET}
+  git-guard --batch commands.jsonl --workers 4 > verdicts.jsonl
+  cat commands.txt | git-guard --batch -
+
+  {GREEN}# Long-lived guard server (query with git-guard-client.py){RESET}
+  git-guard --serve --socket ~/.ralph/run/git-guard.sock
+
   {YELLOW}# ALLOWED command (only this exact form):{RESET}
   git-guard "rm -rf .next/"
 
@@ -245,10 +1357,54 @@ Examples:
                         help='Quiet mode')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help='Verbose output')
+    parser.add_argument('--json', action='store_true',
+                        help='Print the verdict as JSON (exit 1 if blocked)')
+    parser.add_argument('--batch', '-b', metavar='FILE',
+                        help="Evaluate commands from FILE ('-' for stdin), one per "
+                             "line or JSONL, and print JSONL verdicts")
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for --batch (default: CPU count)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run the guard server on a Unix domain socket')
+    parser.add_argument('--socket', type=Path, default=DEFAULT_SOCKET,
+                        help=f'Server socket path (default: {DEFAULT_SOCKET})')
 
     args = parser.parse_args()
 
-    guard = GitGuard(allow_mode=args.allow)
+    if args.serve:
+        if args.allow:
+            parser.error('--allow cannot be used with --serve (the server is shared '
+                         'by every client)')
+        serve(args.socket, quiet=args.quiet)
+        sys.exit(0)
+
+    if args.batch:
+        try:
+            if args.batch == '-':
+                summary = run_batch(sys.stdin, sys.stdout, args.workers, args.allow)
+            else:
+                batch_path = Path(args.batch)
+                if not batch_path.exists():
+                    print(f"{RED}Error: Batch file not found: {batch_path}{RESET}")
+                    sys.exit(1)
+                with open(batch_path, 'r', encoding='utf-8', errors='replace') as f:
+                    summary = run_batch(f, sys.stdout, args.workers, args.allow)
+        except BrokenPipeError:
+            # Reader closed early (`--batch big.txt | head`): stop quietly.
+            # stdout is pointed at devnull so the flush at exit cannot fail.
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            sys.exit(1)
+        if not args.quiet:
+            print(f"git-guard batch: {summary['total']} commands, "
+                  f"{summary['blocked_count']} blocked, "
+                  f"{summary['safe_count']} safe, "
+                  f"{summary['skipped']} skipped in {summary['seconds']}s",
+                  file=sys.stderr)
+        sys.exit(1 if summary['blocked_count'] else 0)
+
+    # One check per run has nothing to reuse; scripts repeat lines
+    guard = GitGuard(allow_mode=args.allow, cache_size=None if args.script else 0)
 
     if args.script:
         # Validate script file
@@ -270,6 +1426,13 @@ Examples:
                 print(f"{GREEN}✅ Script validation passed{RESET}")
             sys.exit(0)
 
+    if args.command and args.json:
+        import json
+
+        verdict = guard.verdict(args.command)
+        print(json.dumps(verdict))
+        sys.exit(0 if verdict["safe"] else 1)
+
     if args.command:
         # Guard single command
         guard.guard(args.command)
@@ -13,6 +13,8 @@
 # Usage:
 #   bash scripts/l1-rebuild.sh              # Manual run
 #   python3 .claude/lib/layers.py --install-cron  # Install cron
+#   python3 scripts/l1-watch.py             # Continuous: rebuild + graduate on change
+#                                           # (same lock, state file and log)
 
 set -euo pipefail
 
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+l1-watch.py - Long-running L1 rebuild + rule graduation service
+
+Watches ~/.ralph/procedural/rules.json and, once changes settle, rebuilds
+L1_essential.md and graduates proven rules in-process. New rules become
+visible within seconds instead of at the next 6 AM cron run, and no Python
+interpreter is started per rebuild.
+
+VERSION: 1.0.0
+
+Same contract as scripts/l1-rebuild.sh, so the two can run side by side:
+  - Lock: atomic mkdir of /tmp/l1-rebuild.lock (a busy lock defers the rebuild;
+    retries back off and are bounded, and a lock older than 10 minutes is
+    treated as left behind by a killed run and removed)
+  - Idempotency: SHA-1 of rules.json vs ~/.ralph/layers/.l1-last-rebuild
+  - Logging: ~/.ralph/logs/l1-rebuild.log, same line format
+
+Change detection uses inotify on Linux (via ctypes, no extra dependency)
+and falls back to polling the file's mtime/size/inode elsewhere.
+
+Usage:
+  python3 scripts/l1-watch.py                 # watch until SIGINT/SIGTERM
+  python3 scripts/l1-watch.py --once          # one rebuild check, then exit
+  python3 scripts/l1-watch.py --poll --interval 5 --debounce 3 --max-delay 60
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import importlib.util
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+LAYERS_PY = REPO_DIR / ".claude" / "lib" / "layers.py"
+
+RALPH_DIR = Path.home() / ".ralph"
+RULES_JSON = RALPH_DIR / "procedural" / "rules.json"
+L1_OUTPUT = RALPH_DIR / "layers" / "L1_essential.md"
+STATE_FILE = RALPH_DIR / "layers" / ".l1-last-rebuild"
+LOG_FILE = RALPH_DIR / "logs" / "l1-rebuild.log"
+LOCK_DIR = Path("/tmp/l1-rebuild.lock")
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_INTERVAL = 2.0
+# Rebuild at the latest this long after the first change, even if writes continue
+DEFAULT_MAX_DELAY = 30.0
+
+# Busy lock: retry after debounce, 2x, 4x, ... then wait for the next change
+LOCK_RETRIES = 6
+# A rebuild takes seconds; a lock this old was left by a killed run
+STALE_LOCK_AGE = 600.0
+
+
+# =============================================================================
+# Change detection
+# =============================================================================
+#
+# Both backends block in select() on a self-pipe as well, so wake() (from
+# L1Watcher.stop() or a signal handler) ends any wait immediately.
+
+class _Wakeup:
+    """Self-pipe; once woken, every later wait returns at once."""
+
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+        for fd in (self.read_fd, self.write_fd):
+            os.set_blocking(fd, False)
+
+    def wake(self) -> None:
+        try:
+            os.write(self.write_fd, b'x')
+        except (BlockingIOError, OSError):
+            pass  # already woken, or closed
+
+    def close(self) -> None:
+        for fd in (self.read_fd, self.write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class PollingWatch:
+    """Detect changes to a file by polling its mtime, size and inode."""
+
+    def __init__(self, path: Path, interval: float = DEFAULT_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self._signature = self._stat()
+        self._wakeup = _Wakeup()
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """
+        Block until the file changes, timeout seconds pass or wake() is called.
+
+        Returns:
+            True if the file changed, False on timeout or wake-up
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            signature = self._stat()
+            if signature != self._signature:
+                self._signature = signature
+                return True
+            delay = self.interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            readable, _, _ = select.select([self._wakeup.read_fd], [], [], delay)
+            if readable:
+                return False
+
+    def wake(self):
+        self._wakeup.wake()
+
+    def close(self):
+        self._wakeup.close()
+
+
+class InotifyWatch:
+    """
+    Detect changes to a file with Linux inotify.
+
+    The parent directory is watched so atomic replace-by-rename writes
+    (write temp file, rename over rules.json) are seen as well.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, path: Path):
+        """
+        Raises:
+            OSError: If inotify is unavailable
+        """
+        self.path = Path(path)
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify not available")
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        wd = libc.inotify_add_watch(self.fd, str(self.path.parent).encode(), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {self.path.parent}")
+        self._wakeup = _Wakeup()
+
+    def _drain(self) -> bool:
+        """Read pending events; True if any concerned the watched file."""
+        changed = False
+        target = self.path.name.encode()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, name_len = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = data[offset:offset + name_len].rstrip(b'\0')
+                offset += name_len
+                if name == target:
+                    changed = True
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        """
+        Block until the file changes, timeout seconds pass or wake() is called.
+
+        Returns:
+            True if the file changed, False on timeout or wake-up
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select(
+                [self.fd, self._wakeup.read_fd], [], [], remaining)
+            if self._wakeup.read_fd in readable:
+                return False
+            if readable and self._drain():
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def wake(self):
+        self._wakeup.wake()
+
+    def close(self):
+        os.close(self.fd)
+        self._wakeup.close()
+
+
+def make_watch(path: Path, poll: bool = False, interval: float = DEFAULT_INTERVAL):
+    """Return an InotifyWatch where possible, else a PollingWatch."""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatch(path)
+        except OSError:
+            pass
+    return PollingWatch(path, interval)
+
+
+# =============================================================================
+# Rebuild service
+# =============================================================================
+
+class L1Watcher:
+    """
+    Debounced L1 rebuild + graduation, sharing l1-rebuild.sh's lock,
+    state file and log.
+    """
+
+    def __init__(self, rules_json: Path = RULES_JSON, l1_output: Path = L1_OUTPUT,
+                 state_file: Path = STATE_FILE, log_file: Path = LOG_FILE,
+                 lock_dir: Path = LOCK_DIR, layers_py: Path = LAYERS_PY,
+                 debounce: float = DEFAULT_DEBOUNCE, graduate: bool = True,
+                 lock_retries: int = LOCK_RETRIES,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        self.rules_json = Path(rules_json)
+        self.l1_output = Path(l1_output)
+        self.state_file = Path(state_file)
+        self.log_file = Path(log_file)
+        self.lock_dir = Path(lock_dir)
+        self.layers_py = Path(layers_py)
+        self.debounce = debounce
+        self.graduate = graduate
+        self.lock_retries = lock_retries
+        self.max_delay = max_delay
+        self._layers = None
+        self._layers_signature = None
+        self.stopping = threading.Event()
+        self._watch = None
+
+    def log(self, message: str) -> None:
+        """Print and append to the rebuild log (l1-rebuild.sh format)."""
+        stamp = datetime.now().astimezone().isoformat(timespec='seconds')
+        line = f"[{stamp}] l1-rebuild: {message}"
+        print(line, flush=True)
+        try:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError:
+            pass
+
+    def rules_hash(self) -> Optional[str]:
+        """SHA-1 of rules.json, as written by `shasum` in l1-rebuild.sh."""
+        digest = hashlib.sha1()
+        try:
+            with open(self.rules_json, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            return None
+        return digest.hexdigest()
+
+    def _load_layers(self):
+        """
+        Import layers.py, keeping it across rebuilds until the file changes.
+
+        An install.sh run or git pull replaces layers.py under the service;
+        re-importing then keeps the watcher in step with cron rebuilds.
+        """
+        st = self.layers_py.stat()
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if self._layers is None or signature != self._layers_signature:
+            if self._layers is not None:
+                self.log(f"INFO: {self.layers_py} changed, reloading")
+            # layers.py imports its neighbours (aaak, ...) as top-level
+            # modules, as it does under `python3 layers.py` in l1-rebuild.sh
+            lib_dir = str(self.layers_py.parent)
+            if lib_dir not in sys.path:
+                sys.path.insert(0, lib_dir)
+            spec = importlib.util.spec_from_file_location('layers', str(self.layers_py))
+            module = importlib.util.module_from_spec(spec)
+            # Registered as `layers` (as `from layers import ...` would) so
+            # its dataclasses and pickling resolve the module by name
+            previous = sys.modules.get('layers')
+            sys.modules['layers'] = module
+            try:
+                spec.loader.exec_module(module)
+            except BaseException:
+                if previous is None:
+                    sys.modules.pop('layers', None)
+                else:
+                    sys.modules['layers'] = previous
+                raise
+            self._layers = module
+            self._layers_signature = signature
+        self._layers.PROCEDURAL_RULES_JSON = self.rules_json
+        return self._layers
+
+    def _acquire_lock(self) -> bool:
+        """mkdir the lock, first reclaiming it if older than STALE_LOCK_AGE."""
+        try:
+            self.lock_dir.mkdir()
+            return True
+        except FileExistsError:
+            pass
+        try:
+            stale = self.lock_dir.stat()
+        except FileNotFoundError:
+            stale = None  # released meanwhile
+        if stale is not None:
+            age = time.time() - stale.st_mtime
+            if age <= STALE_LOCK_AGE:
+                return False
+            self.log(f"WARN: Removing stale lock {self.lock_dir} ({age:.0f}s old)")
+            if not self._reclaim_lock(stale):
+                return False
+        try:
+            self.lock_dir.mkdir()
+            return True
+        except FileExistsError:
+            return False
+
+    def _reclaim_lock(self, stale: os.stat_result) -> bool:
+        """
+        Move a stale lock out of the way without touching a fresh one.
+
+        Another watcher may reclaim the same stale lock and mkdir its own
+        between our stat and our removal, so the lock is renamed to a name
+        of our own first: the rename fails if it is already gone, and the
+        renamed directory is checked to still be the one found stale.
+
+        Returns:
+            True if the stale lock was removed
+        """
+        moved = self.lock_dir.with_name(
+            f"{self.lock_dir.name}.stale.{os.getpid()}.{time.monotonic_ns()}")
+        try:
+            os.rename(self.lock_dir, moved)
+        except OSError:
+            return False  # reclaimed (or released) by someone else
+        current = moved.stat()
+        # mtime as well as inode: a fresh lock may reuse the stale one's inode
+        if ((current.st_dev, current.st_ino, current.st_mtime_ns)
+                != (stale.st_dev, stale.st_ino, stale.st_mtime_ns)):
+            # Took a lock created after the stale one was reclaimed: put it back
+            try:
+                os.rename(moved, self.lock_dir)
+            except OSError as e:
+                self.log(f"ERROR: Could not restore lock {self.lock_dir}: {e}")
+            return False
+        try:
+            moved.rmdir()
+        except OSError:
+            pass  # only the name matters; the lock is free either way
+        return True
+
+    def rebuild(self) -> str:
+        """
+        Rebuild L1 and graduate rules if rules.json changed.
+
+        Returns:
+            'rebuilt', 'unchanged', 'locked' or 'error'
+        """
+        for directory in (self.log_file.parent, self.l1_output.parent):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        # Lock file (atomic mkdir prevents TOCTOU race)
+        if not self._acquire_lock():
+            self.log("INFO: Another rebuild running, deferring")
+            return 'locked'
+
+        try:
+            current_hash = self.rules_hash()
+            if (current_hash is not None and self.state_file.exists()
+                    and self.l1_output.exists()):
+                last_hash = self.state_file.read_text(encoding='utf-8').strip()
+                if current_hash == last_hash:
+                    self.log(f"INFO: rules.json unchanged (hash: {current_hash[:8]}...), "
+                             f"skipping rebuild")
+                    return 'unchanged'
+
+            self.log(f"INFO: Starting L1 rebuild from {self.rules_json}")
+            if not self.layers_py.exists():
+                self.log(f"ERROR: layers.py not found at {self.layers_py}")
+                return 'error'
+
+            start = time.perf_counter()
+            try:
+                layers = self._load_layers()
+                written = layers.Layer1(path=self.l1_output).build()
+                self.log(f"BUILD: wrote {written}")
+                if self.graduate:
+                    promoted, skipped = layers.graduate_rules(dry_run=False)
+                    self.log(f"GRADUATE: {len(promoted)} promoted, {len(skipped)} skipped")
+            except Exception as e:  # keep the service alive across bad rule files
+                self.log(f"ERROR: rebuild failed: {type(e).__name__}: {e}")
+                return 'error'
+
+            # Record state
+            if current_hash is not None:
+                self.state_file.write_text(current_hash + '\n', encoding='utf-8')
+
+            # Verify
+            if not self.l1_output.exists():
+                self.log(f"ERROR: L1 output not created at {self.l1_output}")
+                return 'error'
+            content = self.l1_output.read_text(encoding='utf-8')
+            rule_count = sum(1 for line in content.splitlines() if line.startswith('## '))
+            token_est = len(content.encode('utf-8')) // 4
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.log(f"INFO: Rebuild complete — {rule_count} rules, "
+                     f"~{token_est} estimated tokens ({elapsed_ms:.0f}ms)")
+            return 'rebuilt'
+        finally:
+            try:
+                self.lock_dir.rmdir()
+            except OSError:
+                pass
+
+    def settle(self, watch) -> None:
+        """
+        Wait until writes stop for `debounce` seconds, or at most `max_delay`
+        seconds, so a writer that never pauses cannot postpone the rebuild.
+        """
+        deadline = time.monotonic() + self.max_delay
+        while not self.stopping.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not watch.wait(min(self.debounce, remaining)):
+                return
+
+    def stop(self) -> None:
+        """
+        Make run() return as soon as possible.
+
+        Safe to call from another thread or a signal handler: it sets the
+        stopping flag and wakes the watch run() is blocked on.
+        """
+        self.stopping.set()
+        if self._watch is not None:
+            self._watch.wake()
+
+    def run(self, watch) -> None:
+        """Rebuild once to catch up, then after every settled change, until stop()."""
+        self._watch = watch
+        if self.stopping.is_set():
+            return
+        self.log(f"INFO: Watching {self.rules_json} ({type(watch).__name__}, "
+                 f"debounce {self.debounce}s, max delay {self.max_delay}s)")
+        pending = True
+        retries = 0
+        while not self.stopping.is_set():
+            if not pending and not watch.wait(None):
+                continue  # woken without a change: re-check stopping
+            self.settle(watch)
+            if self.stopping.is_set():
+                break
+            if self.rebuild() != 'locked':
+                pending = False
+                retries = 0
+            elif retries < self.lock_retries:
+                # Back off, unless rules.json changes first
+                watch.wait(self.debounce * 2 ** retries)
+                pending = True
+                retries += 1
+            else:
+                self.log(f"WARN: {self.lock_dir} still held after {retries} retries, "
+                         f"waiting for the next change")
+                pending = False
+                retries = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='l1-watch: rebuild L1 and graduate rules when rules.json changes')
+    parser.add_argument('--once', action='store_true',
+                        help='Run one rebuild check (like l1-rebuild.sh) and exit')
+    parser.add_argument('--poll', action='store_true',
+                        help='Use polling instead of inotify')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'Polling interval in seconds (default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'Quiet period before rebuilding (default: {DEFAULT_DEBOUNCE})')
+    parser.add_argument('--max-delay', type=float, default=DEFAULT_MAX_DELAY,
+                        help='Rebuild after this many seconds even if writes continue '
+                             f'(default: {DEFAULT_MAX_DELAY})')
+    parser.add_argument('--rules', type=Path, default=RULES_JSON,
+                        help=f'rules.json to watch (default: {RULES_JSON})')
+    parser.add_argument('--no-graduate', action='store_true',
+                        help='Only rebuild L1, skip rule graduation')
+    args = parser.parse_args()
+
+    watcher = L1Watcher(rules_json=args.rules, debounce=args.debounce,
+                        graduate=not args.no_graduate, max_delay=args.max_delay)
+
+    if args.once:
+        status = watcher.rebuild()
+        sys.exit(1 if status == 'error' else 0)
+
+    args.rules.parent.mkdir(parents=True, exist_ok=True)
+    watch = make_watch(args.rules, poll=args.poll, interval=args.interval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    try:
+        watcher.run(watch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watch.close()
+        watcher.log("INFO: Watcher stopped")
+
+
+if __name__ == '__main__':
+    main()
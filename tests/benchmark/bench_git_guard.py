@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+bench_git_guard.py - Per-command latency of scripts/git-guard.py
+
+Compares the sequential BLOCKED_PATTERNS scan (one re.search per pattern,
+as in git-guard.py <= 2.0.1) against the current guard (single-pass compiled
+matcher + shell-aware segmentation). Every command the sequential scan
+blocks must still be blocked, with the same pattern when the command starts
+with a trigger; commands blocked only by segmentation (cd x && rm -rf y,
+$(...), subshells) are counted separately.
+
+Corpus: ~10k commands. By default a deterministic synthetic mix of everyday
+agent commands and dangerous ones; pass --corpus FILE (one command per line,
+e.g. extracted from ~/.ralph/logs) to replay real commands instead.
+
+The decision cache (GitGuard.cache_info()) is reported for one cold replay
+of the corpus, i.e. the hit rate an agent session with that mix would see.
+
+--long times generated 1KB..10KB command lines (long pipelines, && chains,
+quoted strings) and prints before/after microseconds per size: "before" is
+the sequential scan, which only looks at the start of the line, "after" the
+current guard, which must also find triggers later in the line. Lines with
+no trigger text stay in the tens of microseconds at 10KB. Lines that do
+contain trigger text (here inside quotes) are fully tokenized, which is
+linear in their length.
+
+Usage:
+  python3 tests/benchmark/bench_git_guard.py
+  python3 tests/benchmark/bench_git_guard.py --corpus commands.txt --runs 5
+  python3 tests/benchmark/bench_git_guard.py --long
+"""
+
+import argparse
+import importlib.util
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+GIT_GUARD_PATH = REPO_ROOT / "scripts" / "git-guard.py"
+
+SAFE_COMMANDS = [
+    "git status",
+    "git log --oneline -20",
+    "git diff HEAD~1",
+    "git add -A",
+    "git commit -m 'wip'",
+    "git push origin main",
+    "npm test",
+    "npm run build",
+    "pytest -x",
+    "python3 -m pytest -q tests/",
+    "ls -la",
+    "cat README.md",
+    "grep -rn TODO src/",
+    "cd src && make",
+    "rm -rf .next/",
+]
+
+# Harmless commands the policy still blocks: they start with a trigger
+# prefix and no pattern clears them (blocked as "Suspicious")
+BLOCKED_BY_POLICY_COMMANDS = [
+    "git clean -n",
+    "git reset --soft HEAD~1",
+    "rm notes.txt",
+    "rm -i scratch.log",
+]
+
+DANGEROUS_COMMANDS = [
+    "rm -rf node_modules",
+    "rm -rf dist && npm run build",
+    "rm -rf .git",
+    "rm -r *",
+    "rm -rf build; make",
+    "git clean -fdx",
+    "git clean -f -d -x",
+    "git reset --hard HEAD",
+    "git reset --hard @{u}",
+    "rm -rf target && cargo build && rm -rf .venv",
+    "cd app && rm -rf node_modules",
+    "echo $(git clean -fdx)",
+]
+
+# Building blocks for --long: each shape is repeated up to the target size
+LONG_SHAPES = {
+    "pipeline": "git log --oneline | grep -v wip | sort | uniq -c | ",
+    "and_chain": "mkdir -p out && git add -A && git status && ",
+    "mixed_separators": "(cd pkg; npm ci) || echo failed; ",
+    "quoted_string": "echo \"rm -rf is mentioned $HOME 'inside' quotes\" && ",
+    "trigger_first": "rm -rf ./tmp/cache-entry ; ",
+}
+
+
+def load_git_guard():
+    spec = importlib.util.spec_from_file_location("git_guard", str(GIT_GUARD_PATH))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_corpus(size: int, seed: int = 42) -> list[str]:
+    """
+    Deterministic mix: ~75% safe commands, ~10% harmless commands blocked
+    by policy, ~15% dangerous ones.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        draw = rng.random()
+        if draw < 0.15:
+            pool = DANGEROUS_COMMANDS
+        elif draw < 0.25:
+            pool = BLOCKED_BY_POLICY_COMMANDS
+        else:
+            pool = SAFE_COMMANDS
+        command = rng.choice(pool)
+        # Vary the tail so the corpus is not just a handful of strings.
+        # rm -rf .next/ is only allowed verbatim, so it keeps no tail.
+        if rng.random() < 0.5 and command != "rm -rf .next/":
+            command = f"{command}  # step {i}"
+        corpus.append(command)
+    return corpus
+
+
+def legacy_check(guard_cls, command: str) -> tuple[bool, str]:
+    """Reference: the per-pattern re.search loop from git-guard.py 2.0.1."""
+    normalized = command.strip()
+    if not any(normalized.startswith(p) for p in guard_cls.TRIGGER_PREFIXES):
+        return True, "No dangerous trigger found"
+    if normalized == guard_cls.ALLOWED_EXACT:
+        return True, f"Allowed: {guard_cls.ALLOWED_EXACT}"
+    for pattern in guard_cls.BLOCKED_PATTERNS:
+        if re.search(pattern, normalized, re.IGNORECASE):
+            return False, f"BLOCKED: Dangerous pattern '{pattern}' detected"
+    return False, "BLOCKED: Suspicious command pattern detected"
+
+
+def long_command(shape: str, size: int) -> str:
+    """Repeat a shape to about `size` bytes, ending in a harmless command."""
+    unit = LONG_SHAPES[shape]
+    return (unit * (size // len(unit) + 1))[:size - 4].rstrip("&|; ") + " && ls"
+
+
+def time_per_command(check, corpus: list[str], runs: int) -> float:
+    """Median over runs of mean microseconds per command."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for command in corpus:
+            check(command)
+        samples.append((time.perf_counter() - start) / len(corpus) * 1e6)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="git-guard matcher benchmark")
+    parser.add_argument("--corpus", type=Path, help="File with one command per line")
+    parser.add_argument("--size", type=int, default=10_000, help="Synthetic corpus size")
+    parser.add_argument("--runs", type=int, default=5, help="Timing runs")
+    parser.add_argument("--long", action="store_true", help="Time 1KB..10KB commands")
+    parser.add_argument("--json", action="store_true", help="Emit JSON")
+    args = parser.parse_args()
+
+    module = load_git_guard()
+    guard_cls = module.GitGuard
+    guard = guard_cls(cache_size=0)
+    cached_guard = guard_cls()
+
+    if args.corpus:
+        corpus = [
+            line.rstrip("\n")
+            for line in args.corpus.read_text(encoding="utf-8").splitlines()
+            if line.strip()
+        ]
+    else:
+        corpus = synthetic_corpus(args.size)
+
+    def legacy(command):
+        return legacy_check(guard_cls, command)
+
+    # The guard may only get stricter: nothing the sequential scan blocked
+    # may pass, and trigger-prefixed commands must report the same pattern
+    loosened = []
+    pattern_mismatches = []
+    newly_blocked = 0
+    for command in corpus:
+        old_verdict = legacy(command)
+        new_verdict = guard.check_command(command)
+        if not old_verdict[0] and new_verdict[0]:
+            loosened.append(command)
+        elif not old_verdict[0] and old_verdict != new_verdict:
+            pattern_mismatches.append(command)
+        elif old_verdict[0] and not new_verdict[0]:
+            newly_blocked += 1
+    mismatches = loosened + pattern_mismatches
+
+    triggered = [
+        command for command in corpus
+        if command.strip().startswith(tuple(guard_cls.TRIGGER_PREFIXES))
+    ]
+    blocked = sum(1 for command in corpus if not guard.check_command(command)[0])
+
+    result = {
+        "benchmark": "git_guard_matcher",
+        "corpus_size": len(corpus),
+        "triggered": len(triggered),
+        "blocked": blocked,
+        "runs": args.runs,
+        "mismatches": len(mismatches),
+        "newly_blocked_by_segmentation": newly_blocked,
+        "all_us_per_command": {
+            "sequential": round(time_per_command(legacy, corpus, args.runs), 3),
+            "compiled": round(time_per_command(guard.check_command, corpus, args.runs), 3),
+            "cached": round(time_per_command(cached_guard.check_command, corpus, 1), 3),
+        },
+    }
+    # Cache stats for a single pass over the corpus (one cold replay)
+    result["cache"] = cached_guard.cache_info()
+    if triggered:
+        result["triggered_us_per_command"] = {
+            "sequential": round(time_per_command(legacy, triggered, args.runs), 3),
+            "compiled": round(time_per_command(guard.check_command, triggered, args.runs), 3),
+        }
+
+    if args.long:
+        scaling = {}
+        for shape in LONG_SHAPES:
+            scaling[shape] = {}
+            for size in (1024, 2048, 5120, 10240):
+                command = [long_command(shape, size)]
+                scaling[shape][size] = {
+                    "before_us": round(time_per_command(legacy, command, args.runs), 1),
+                    "after_us": round(time_per_command(guard.check_command, command, args.runs), 1),
+                }
+        result["long_commands"] = scaling
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"corpus: {result['corpus_size']} commands "
+              f"({result['triggered']} hit a trigger prefix, "
+              f"{result['blocked']} blocked), runs: {args.runs}")
+        for key in ("all_us_per_command", "triggered_us_per_command"):
+            if key in result:
+                seq = result[key]["sequential"]
+                comp = result[key]["compiled"]
+                speedup = seq / comp if comp else 0.0
+                print(f"  {key:<26} sequential {seq:8.3f} us   "
+                      f"compiled {comp:8.3f} us   x{speedup:.1f}")
+        print(f"  verdict/pattern mismatches: {result['mismatches']}")
+        print(f"  newly blocked by segmentation: {result['newly_blocked_by_segmentation']}")
+        cache = result["cache"]
+        print(f"  decision cache: {result['all_us_per_command']['cached']:.3f} us/command, "
+              f"{cache['hits']} hits / {cache['misses']} misses "
+              f"(hit rate {cache['hit_rate']:.1%})")
+        if "long_commands" in result:
+            print("  long commands, us per command (before = sequential scan, after = guard):")
+        for shape, sizes in result.get("long_commands", {}).items():
+            timings = "  ".join(
+                f"{size // 1024}KB {t['before_us']:.0f} -> {t['after_us']:.0f}"
+                for size, t in sizes.items()
+            )
+            print(f"    {shape:<17} {timings}")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
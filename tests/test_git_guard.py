@@ -0,0 +1,650 @@
+#!/usr/bin/env python3
+"""
+Unit tests for scripts/git-guard.py (standalone CLI guard)
+
+Tests the compiled BLOCKED_PATTERNS matcher against the sequential scan it
+replaces, the allow/block decisions of check_command(), and the guard
+server / client shim (scripts/git-guard-client.py).
+
+Run with: pytest tests/test_git_guard.py -v
+"""
+
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "..", "scripts")
+
+
+def _load(name, filename):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(SCRIPTS_DIR, filename)
+    )
+    module = importlib.util.module_from_spec(spec)
+    # Registered so batch-mode worker functions can be pickled by name
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+git_guard = _load("git_guard", "git-guard.py")
+git_guard_client = _load("git_guard_client", "git-guard-client.py")
+
+GitGuard = git_guard.GitGuard
+
+
+def sequential_match(command):
+    """Reference implementation: first pattern in list order that matches."""
+    for pattern in GitGuard.BLOCKED_PATTERNS:
+        if re.search(pattern, command, re.IGNORECASE):
+            return pattern
+    return None
+
+
+COMMANDS = [
+    "rm -rf node_modules",
+    "rm -rf .git",
+    "rm -rf dist && npm run build",
+    "rm -rf build; rm -rf .venv",
+    "rm -rf target && cargo build && rm -rf .",
+    "rm -r *",
+    "rm -RF Node_Modules",
+    "rm notes.txt",
+    "rm -rf .next/",
+    "rm -rf /tmp/scratch",
+    "git clean -fdx",
+    "git clean -f -d -x",
+    "git clean -n",
+    "git reset --hard HEAD",
+    "git reset --hard @{u}",
+    "git reset --soft HEAD~1",
+    "git status",
+    "npm test",
+    "",
+]
+
+
+class TestCompiledMatcher:
+    """The single-pass matcher must agree with the sequential scan."""
+
+    @pytest.mark.parametrize("command", COMMANDS)
+    def test_matches_sequential_scan(self, command):
+        assert GitGuard().match_blocked(command) == sequential_match(command)
+
+    def test_reports_earliest_listed_pattern(self):
+        """A later-listed pattern matching further left must not win."""
+        command = "rm -rf build && rm -rf ."
+        assert GitGuard().match_blocked(command) == r'rm\s+-rf\s+\.'
+
+    def test_no_match_returns_none(self):
+        assert GitGuard().match_blocked("git status") is None
+
+    def test_patterns_compiled_once(self):
+        guard = GitGuard()
+        guard.match_blocked("rm -rf dist")
+        compiled = GitGuard._BLOCKED_RE
+        GitGuard().match_blocked("rm -rf build")
+        assert GitGuard._BLOCKED_RE is compiled
+
+
+class TestCheckCommand:
+    """Allow/block decisions of check_command()."""
+
+    @pytest.mark.parametrize(
+        "command",
+        ["git status", "npm test", "ls -la", "rm -rf .next/", "  rm -rf .next/  "],
+    )
+    def test_safe_commands_allowed(self, command):
+        is_safe, _ = GitGuard().check_command(command)
+        assert is_safe is True
+
+    def test_blocked_message_names_pattern(self):
+        is_safe, message = GitGuard().check_command("rm -rf node_modules")
+        assert is_safe is False
+        assert r"rm\s+-rf\s+node_modules" in message
+
+    def test_suspicious_trigger_blocked(self):
+        is_safe, message = GitGuard().check_command("rm notes.txt")
+        assert is_safe is False
+        assert "Suspicious" in message
+
+    def test_counters(self):
+        guard = GitGuard()
+        guard.check_command("rm -rf .next/")
+        guard.check_command("rm -rf dist")
+        assert guard.allowed_count == 1
+        assert guard.blocked_count == 1
+
+    def test_allow_mode(self):
+        is_safe, _ = GitGuard(allow_mode=True).check_command("rm -rf .git")
+        assert is_safe is True
+
+    def test_single_check_skips_server_imports(self):
+        # The CLI and the client's in-process fallback pay for every import
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime",
+             os.path.join(SCRIPTS_DIR, "git-guard.py"), "rm -rf dist"],
+            capture_output=True, text=True,
+        )
+        assert result.returncode == 1
+        loaded = {
+            line.rsplit("|", 1)[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+        for name in ("socket", "socketserver", "threading", "json", "hashlib", "typing"):
+            assert name not in loaded
+
+
+class TestSegmentCommand:
+    """Shell-aware segmentation of chained command lines."""
+
+    @pytest.mark.parametrize(
+        "command,expected",
+        [
+            ("git status", ["git status"]),
+            ("cd src && rm -rf dist", ["cd src", "rm -rf dist"]),
+            ("a || b; c | d & e", ["a", "b", "c", "d", "e"]),
+            ("(cd pkg; make)", ["cd pkg", "make"]),
+            ("echo $(rm -rf build)", ["echo", "rm -rf build"]),
+            ("echo `rm -rf .`", ["echo", "rm -rf ."]),
+            ("git   commit  -m 'a && b'", ["git commit -m a && b"]),
+            ('echo "$(git clean -fdx)"', ["git clean -fdx", "echo $(git clean -fdx)"]),
+            ("r'm' -rf x", ["rm -rf x"]),
+            ("rm \\\n-rf x", ["rm -rf x"]),
+            ("echo 'unterminated && rm -rf x", ["echo unterminated && rm -rf x"]),
+            ("ls # && rm -rf x", ["ls"]),
+            ("a # c\nrm -rf x", ["a", "rm -rf x"]),
+            ("echo a#b $# '#'", ["echo a#b $# #"]),
+            ("cat <<EOF\nrm -rf x\nEOF\nls", ["cat", "ls"]),
+            ("cat <<EOF > f && make\nrm -rf x\nEOF", ["cat > f", "make"]),
+            ('echo "$(echo "a"; rm -rf x)"',
+             ["echo a", "rm -rf x", 'echo $(echo "a"; rm -rf x)']),
+            ('echo "a; rm -rf x"', ["echo a; rm -rf x"]),
+            ("", []),
+        ],
+    )
+    def test_segments(self, command, expected):
+        assert git_guard.segment_command(command) == expected
+
+    def test_fast_path_matches_tokenizer(self):
+        """Unquoted commands split identically with and without the tokenizer."""
+        rng = random.Random(7)
+        for _ in range(500):
+            command = _random_command(rng, quotes=False)
+            # An empty quoted word forces the tokenizer path without adding a word
+            assert git_guard.segment_command(command) == git_guard.segment_command(
+                command + " ''"
+            )
+
+
+class TestChainedCommands:
+    """Triggers hidden after separators are blocked; nothing is loosened."""
+
+    @pytest.mark.parametrize(
+        "command",
+        [
+            "cd app && rm -rf node_modules",
+            "make; git clean -fdx",
+            "echo $(git reset --hard HEAD)",
+            "(cd repo && git reset --hard HEAD~3)",
+            '"rm" -rf dist',
+            "{ rm -rf dist; }",
+            "if true; then rm -rf dist; fi",
+            "if rm -rf dist; then :; fi",
+            "for f in a; do rm -rf $f; done",
+            "! git clean -fdx",
+            "sudo rm -rf dist",
+            "time rm -rf dist",
+            "env rm -rf dist",
+            "nohup rm -rf dist &",
+            "command rm -rf dist",
+            "exec git reset --hard HEAD",
+            "find . -name '*.pyc' | xargs rm -rf",
+            "FOO=1 rm -rf dist",
+            "sudo -E env X=1 nohup rm -rf dist",
+            "sudo -u root rm -rf /",
+            "nice -n 10 rm -rf dist",
+            "env -u X rm -rf dist",
+            "timeout 5 rm -rf dist",
+            "timeout -s KILL 5 git clean -fdx",
+            "find . | xargs -I {} rm -rf {}",
+            "git -C repo reset --hard HEAD",
+            "git -c core.x=y clean -fdx",
+            "bash -c 'rm -rf dist'",
+            "sh -c 'cd x && rm -rf dist'",
+            'sudo bash -lc "git clean -fdx"',
+            "eval 'rm -rf dist'",
+            "cd x && rm -rf .next/ && rm -rf dist",
+            "cd x; rm -rf .next/; git clean -fdx",
+            "ls '#' && rm -rf dist",
+            "echo x #\nrm -rf dist",
+            "find / -maxdepth 1 | xargs rm -rf .next/",
+            "cat list | xargs rm -rf .next/",
+            "cat <<EOF\nrm -rf x\nEOF\nrm -rf dist",
+            "cat <<EOF\n$(rm -rf dist)\nEOF",
+            'echo "$(echo "a"; rm -rf dist)"',
+            'echo "$("rm" -rf dist)"',
+            'x="$("git" reset --hard HEAD)"',
+            'echo "$(cd src; "rm" -rf node_modules)"',
+            'echo "`"rm" -rf dist`"',
+        ],
+    )
+    def test_chained_trigger_blocked(self, command):
+        is_safe, _ = GitGuard().check_command(command)
+        assert is_safe is False
+
+    @pytest.mark.parametrize(
+        "command",
+        [
+            "cd src && make",
+            "git commit -m 'fix rm -rf bug'",
+            "npm test 2>&1 | tee log",
+            "echo rm -rf dist",
+            "echo sudo rm -rf dist",
+            "sudo apt update",
+            "time npm test",
+            "env FOO=1 make",
+            "if [ -d x ]; then ls; fi",
+            "while true; do sleep 1; done",
+            "sudo -u root apt update",
+            "timeout 5 npm test",
+            "git -C repo status",
+            "bash script.sh",
+            "bash -c 'echo hi'",
+            "cd apps/web && rm -rf .next/ && npm run build",
+            "sudo rm -rf .next/",
+            "echo done; # rm -rf dist",
+            "ls # && rm -rf x",
+            "git commit -m \"$(cat <<'EOF'\nDrop cleanup step\n\n"
+            "rm -rf build is no longer needed here\nEOF\n)\"",
+            "cat <<EOF\nrm -rf x\nEOF",
+            "git commit -m \"$(cat <<'EOF'\nDon't rebuild (it is slow)\n\n"
+            "rm -rf build is no longer needed here\nEOF\n)\"",
+            "cat <<-'EOF' > notes\n\trm -rf dist\n\tEOF\nls",
+        ],
+    )
+    def test_chained_safe_allowed(self, command):
+        is_safe, _ = GitGuard().check_command(command)
+        assert is_safe is True
+
+    def test_exempt_segment_counts_as_allowed(self):
+        guard = GitGuard()
+        is_safe, message = guard.check_command("cd web && rm -rf .next/ && npm run build")
+        assert is_safe is True
+        assert message == "Allowed: rm -rf .next/"
+        assert guard.allowed_count == 1
+
+    def test_leading_exempt_command_keeps_whole_line_scan(self):
+        # Commands starting with a trigger get the legacy scan, so the
+        # exemption only applies to rm -rf .next/ alone or later in a chain
+        is_safe, message = GitGuard().check_command("rm -rf .next/ && npm run build")
+        assert is_safe is False
+        assert r"rm\s+-rf\s+\." in message
+
+    @pytest.mark.parametrize(
+        "segment,expected",
+        [
+            ("then rm -rf dist", "rm -rf dist"),
+            ("sudo -E env X=1 nohup rm -rf dist", "rm -rf dist"),
+            ("xargs -0 rm -rf", "rm -rf"),
+            ("sudo -u root rm -rf /", "rm -rf /"),
+            ("timeout -k 1 5 rm x", "rm x"),
+            ("git -C repo -c a=b reset --hard", "git reset --hard"),
+            ("echo sudo", "echo sudo"),
+            ("ls -la", "ls -la"),
+        ],
+    )
+    def test_strip_command_prefix(self, segment, expected):
+        assert GitGuard().strip_command_prefix(segment) == expected
+
+    def test_fuzz_prescan_never_skips_a_trigger(self):
+        """The fast path only returns None when no segment is a trigger."""
+
+        class NoPrescanGuard(GitGuard):
+            pass
+
+        NoPrescanGuard._build_command_table()
+        NoPrescanGuard._TRIGGER_SCANS = (re.compile(""),)
+
+        guard, reference = GitGuard(), NoPrescanGuard()
+        rng = random.Random(4321)
+        tokens = ["r'm'", '"git" clean', "rm\\\n", "\\rm", "'rm '", "git\\ reset",
+                  "git -C x reset", "bash -c 'rm x'"]
+        for _ in range(3000):
+            command = _random_command(rng) + " " + rng.choice(tokens)
+            assert guard.find_trigger_segment(command) == reference.find_trigger_segment(
+                command), command
+
+    def test_fuzz_never_looser_than_sequential_scan(self):
+        rng = random.Random(1234)
+        for _ in range(2000):
+            command = _random_command(rng)
+            legacy_blocked = (
+                command.strip().startswith(tuple(GitGuard.TRIGGER_PREFIXES))
+                and command.strip() != GitGuard.ALLOWED_EXACT
+            )
+            is_safe, _ = GitGuard().check_command(command)
+            if legacy_blocked:
+                assert is_safe is False, command
+
+    def test_long_command_is_evaluated(self):
+        command = "git log --oneline | grep fix | " * 400 + "rm -rf dist"
+        assert len(command) > 10_000
+        is_safe, message = GitGuard().check_command(command)
+        assert is_safe is False
+        assert r"rm\s+-rf\s+dist" in message
+
+    def test_deep_quoted_substitution_blocked(self):
+        command = 'echo "' + '$("echo ' * 1200 + "rm -rf dist"
+        is_safe, message = GitGuard().check_command(command)
+        assert is_safe is False
+        assert "nested more than" in message
+
+    def test_deep_shell_nesting_blocked(self):
+        command = "ls && " + "eval " * 1200 + "rm -rf dist"
+        is_safe, message = GitGuard().check_command(command)
+        assert is_safe is False
+        assert "nested more than" in message
+
+        nested = "eval " * GitGuard.MAX_SHELL_NESTING + "rm -rf dist"
+        is_safe, message = GitGuard().check_command("ls && " + nested)
+        assert is_safe is False
+        assert r"rm\s+-rf\s+dist" in message
+        assert GitGuard().check_command("ls && " + "eval " * 1200 + "echo hi")[0] is True
+
+
+class TestDecisionCache:
+    """LRU decision cache keyed on policy version + normalized command."""
+
+    def test_repeated_command_hits_cache(self):
+        guard = GitGuard()
+        for _ in range(3):
+            guard.check_command("git status")
+        guard.check_command("  git status  ")
+        info = guard.cache_info()
+        assert info["misses"] == 1
+        assert info["hits"] == 3
+        assert info["hit_rate"] == 0.75
+
+    def test_cached_verdict_identical(self):
+        guard = GitGuard()
+        first = guard.verdict("rm -rf dist")
+        second = guard.verdict("rm -rf dist")
+        assert first == second == GitGuard(cache_size=0).verdict("rm -rf dist")
+
+    def test_counters_count_cache_hits(self):
+        guard = GitGuard()
+        for _ in range(2):
+            guard.check_command("rm -rf dist")
+            guard.check_command("rm -rf .next/")
+        assert guard.blocked_count == 2
+        assert guard.allowed_count == 2
+
+    def test_cache_is_bounded(self):
+        guard = GitGuard(cache_size=4)
+        for i in range(10):
+            guard.check_command(f"echo {i}")
+        assert guard.cache_info()["size"] == 4
+
+    def test_cache_disabled(self):
+        guard = GitGuard(cache_size=0)
+        guard.check_command("git status")
+        assert guard.cache_info()["maxsize"] == 0
+        assert guard.cache_info()["hits"] == 0
+
+    def test_long_commands_not_cached(self):
+        guard = GitGuard()
+        guard.check_command("echo " + "x" * GitGuard.CACHE_MAX_COMMAND_LENGTH)
+        assert guard.cache_info()["misses"] == 0
+
+    def test_policy_version_tracks_patterns(self):
+        class StricterGuard(GitGuard):
+            BLOCKED_PATTERNS = GitGuard.BLOCKED_PATTERNS + [r"git\s+push\s+--force"]
+
+        assert StricterGuard().policy_version != GitGuard().policy_version
+        assert GitGuard().policy_version == GitGuard().policy_version
+        assert StricterGuard().match_blocked("git push --force") is not None
+        assert GitGuard().match_blocked("git push --force") is None
+
+
+class TestBatchMode:
+    """--batch: stream commands, emit JSONL verdicts with running totals."""
+
+    @pytest.mark.parametrize(
+        "line,expected",
+        [
+            ("git status\n", "git status"),
+            ("   \n", None),
+            ('{"command": "rm -rf dist"}', "rm -rf dist"),
+            ('{"tool_input": {"command": "git clean -fdx"}}', "git clean -fdx"),
+            ('{"event": "SessionStart"}', None),
+            ("{not json", "{not json"),
+        ],
+    )
+    def test_parse_batch_line(self, line, expected):
+        assert git_guard.parse_batch_line(line) == expected
+
+    def _run(self, lines, workers=1):
+        output = io.StringIO()
+        summary = git_guard.run_batch(lines, output, workers=workers)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        return summary, records
+
+    def test_verdicts_and_running_totals(self):
+        lines = ["git status", "", "rm -rf dist", '{"command": "rm -rf .next/"}']
+        summary, records = self._run(lines)
+        assert [r["line"] for r in records] == [1, 3, 4]
+        assert [r["safe"] for r in records] == [True, False, True]
+        assert records[1]["pattern"] == r"rm\s+-rf\s+dist"
+        assert [(r["blocked_count"], r["safe_count"]) for r in records] == [
+            (0, 1), (1, 1), (1, 2),
+        ]
+        assert summary["total"] == 3
+        assert summary["skipped"] == 1
+        assert summary["blocked_count"] == 1
+        assert summary["safe_count"] == 2
+
+    def test_verdicts_match_single_command_check(self):
+        _, records = self._run(COMMANDS)
+        for record in records:
+            expected = GitGuard().verdict(record["command"])
+            assert {k: record[k] for k in expected} == expected
+
+    @pytest.mark.skipif(
+        multiprocessing.get_start_method(allow_none=False) != "fork",
+        reason="worker pool pickles functions of a module loaded from a path",
+    )
+    def test_worker_pool_preserves_order(self):
+        rng = random.Random(99)
+        lines = [_random_command(rng) for _ in range(3000)]
+        single = self._run(lines, workers=1)[1]
+        pooled = self._run(lines, workers=2)[1]
+        assert pooled == single
+
+    def test_input_consumed_lazily(self):
+        pulled = []
+
+        def lines():
+            for number in range(10):
+                pulled.append(number)
+                yield "rm -rf dist"
+
+        class StopAfterFirst(io.StringIO):
+            def write(self, text):
+                raise BrokenPipeError
+
+        with pytest.raises(BrokenPipeError):
+            git_guard.run_batch(lines(), StopAfterFirst())
+        assert pulled == [0]
+
+    def test_broken_pipe_exits_quietly(self, tmp_path):
+        batch = tmp_path / "commands.txt"
+        batch.write_text("rm -rf dist\n" * 50000)
+        for workers in ("1", "2"):
+            proc = subprocess.Popen(
+                [sys.executable, os.path.join(SCRIPTS_DIR, "git-guard.py"),
+                 "--batch", str(batch), "--workers", workers],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+            assert json.loads(proc.stdout.readline())["line"] == 1
+            proc.stdout.close()  # like `| head -1`
+            _, stderr = proc.communicate(timeout=30)
+            assert proc.returncode == 1
+            assert b"Traceback" not in stderr
+
+
+FUZZ_TOKENS = [
+    "rm", "-rf", "-r", "git", "clean", "reset", "--hard", "HEAD", "dist", ".",
+    "*", ".next/", "&&", "||", ";", "|", "&", "(", ")", "$(", "`", "echo",
+    "cd", "ls", "\n", "$HOME", "x", "sudo", "then", "{", "X=1", "-u", "root",
+    "nice", "-n", "10", "timeout", "5", "env", "xargs", "-I", "{}", "-C", "repo",
+    "bash", "-c", "eval", "#", "x#",
+]
+
+
+def _random_command(rng, quotes=True):
+    tokens = FUZZ_TOKENS + (["'", '"', "'a b'", '"$(rm -rf .)"', "\\"] if quotes else [])
+    return " ".join(rng.choice(tokens) for _ in range(rng.randint(1, 12)))
+
+
+@pytest.fixture
+def guard_server(tmp_path):
+    """Run a GuardServer on a temporary socket for the duration of a test."""
+    server = git_guard.GuardServer(tmp_path / "g.sock")
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestGuardServer:
+    """Server and client shim must give the same verdicts as in-process."""
+
+    @pytest.mark.parametrize("command", COMMANDS)
+    def test_server_matches_in_process(self, guard_server, command):
+        socket_path = str(guard_server.socket_path)
+        remote = git_guard_client.query_server({"command": command}, socket_path)
+        assert remote == GitGuard().verdict(command)
+
+    def test_json_output_is_identical(self, guard_server, tmp_path):
+        command = "rm -rf node_modules"
+        served = git_guard_client.check(command, str(guard_server.socket_path))
+        fallback = git_guard_client.check(command, str(tmp_path / "absent.sock"))
+        assert json.dumps(served) == json.dumps(fallback)
+
+    def test_fallback_when_socket_absent(self, tmp_path):
+        socket_path = str(tmp_path / "absent.sock")
+        assert git_guard_client.query_server({"command": "ls"}, socket_path) is None
+        verdict = git_guard_client.check("git clean -fdx", socket_path)
+        assert verdict["safe"] is False
+
+    def test_stats_report_latency_percentiles(self, guard_server):
+        socket_path = str(guard_server.socket_path)
+        for command in COMMANDS:
+            git_guard_client.query_server({"command": command}, socket_path)
+        stats = git_guard_client.query_server({"op": "stats"}, socket_path)
+        assert stats["calls"] == len(COMMANDS)
+        assert 0 <= stats["p50_ms"] <= stats["p99_ms"]
+
+    def test_latency_recorded_per_answered_call(self, guard_server):
+        socket_path = str(guard_server.socket_path)
+        guard_server.handle_request(b'{"command": "ls"}')
+        assert len(guard_server.latencies_ms) == 0
+        git_guard_client.query_server({"command": "ls"}, socket_path)
+        git_guard_client.query_server({"op": "stats"}, socket_path)
+        git_guard_client.query_server({"command": 42}, socket_path)
+        assert len(guard_server.latencies_ms) == 1
+
+    def test_client_reports_round_trip(self, guard_server, tmp_path):
+        socket_path = str(guard_server.socket_path)
+        _, source, round_trip_ms = git_guard_client.check_timed("ls", socket_path)
+        assert source == "server"
+        assert round_trip_ms > 0
+        absent = str(tmp_path / "absent.sock")
+        assert git_guard_client.check_timed("ls", absent)[1] == "in-process"
+
+    def test_client_timing_and_stats_output(self, guard_server, capsys):
+        socket_path = str(guard_server.socket_path)
+        assert git_guard_client.main(["--socket", socket_path, "--timing", "ls"]) == 0
+        out, err = capsys.readouterr()
+        assert json.loads(out)["safe"] is True
+        assert json.loads(err)["source"] == "server"
+        assert git_guard_client.main(["--socket", socket_path, "--stats"]) == 0
+        stats = json.loads(capsys.readouterr().out)
+        assert stats["calls"] == 1
+        assert stats["client_round_trip_ms"] > 0
+
+    def test_server_cache_shared_across_clients(self, guard_server):
+        socket_path = str(guard_server.socket_path)
+        for _ in range(3):
+            git_guard_client.query_server({"command": "npm test"}, socket_path)
+        stats = git_guard_client.query_server({"op": "stats"}, socket_path)
+        assert stats["cache"]["hits"] == 2
+        assert stats["cache"]["misses"] == 1
+
+    def test_invalid_request_rejected(self, guard_server):
+        with pytest.raises(ValueError):
+            guard_server.handle_request(b'["not", "an", "object"]')
+        with pytest.raises(ValueError):
+            guard_server.handle_request(b'{"command": 42}')
+
+    def test_socket_removed_on_close(self, tmp_path):
+        server = git_guard.GuardServer(tmp_path / "g.sock")
+        assert git_guard.socket_alive(server.socket_path)
+        server.server_close()
+        assert not server.socket_path.exists()
+
+    def test_stale_socket_replaced(self, tmp_path):
+        path = tmp_path / "g.sock"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(str(path))  # closed without unlinking, like a crash
+        server = git_guard.GuardServer(path)
+        assert git_guard.socket_alive(server.socket_path)
+        server.server_close()
+
+    def test_allow_mode_refused(self, tmp_path):
+        with pytest.raises(ValueError):
+            git_guard.GuardServer(tmp_path / "g.sock", GitGuard(allow_mode=True))
+        assert not (tmp_path / "g.sock").exists()
+        result = subprocess.run(
+            [sys.executable, os.path.join(SCRIPTS_DIR, "git-guard.py"),
+             "--serve", "--allow", "--socket", str(tmp_path / "g.sock")],
+            capture_output=True, text=True, timeout=30,
+        )
+        assert result.returncode == 2
+        assert "--allow cannot be used with --serve" in result.stderr
+        assert not (tmp_path / "g.sock").exists()
+
+    def test_regular_file_not_deleted(self, tmp_path):
+        path = tmp_path / "g.sock"
+        path.write_text("important")
+        with pytest.raises(FileExistsError):
+            git_guard.GuardServer(path)
+        assert path.read_text() == "important"
+
+    def test_socket_is_owner_only(self, guard_server):
+        assert os.stat(guard_server.socket_path).st_mode & 0o077 == 0
+
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        samples = list(range(1, 101))
+        assert git_guard.percentile(samples, 50) == 50
+        assert git_guard.percentile(samples, 99) == 99
+
+    def test_empty(self):
+        assert git_guard.percentile([], 99) == 0.0
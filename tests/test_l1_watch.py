@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Unit tests for scripts/l1-watch.py
+
+Tests the rebuild contract shared with scripts/l1-rebuild.sh (lock dir,
+SHA-1 state file, log format) and change detection. layers.py is replaced
+by a small fixture module so the watcher logic is tested on its own.
+
+Run with: pytest tests/test_l1_watch.py -v
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "l1_watch",
+    os.path.join(os.path.dirname(__file__), "..", "scripts", "l1-watch.py"),
+)
+l1_watch = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(l1_watch)
+
+
+FAKE_LAYERS = '''
+import pickle
+from dataclasses import dataclass
+from pathlib import Path
+
+PROCEDURAL_RULES_JSON = None
+CALLS = []
+VERSION = 1
+
+
+@dataclass
+class Rule:
+    rule_id: str
+
+
+class Layer1:
+    def __init__(self, path, rule_count=25):
+        self.path = Path(path)
+
+    def build(self):
+        CALLS.append(("build", str(PROCEDURAL_RULES_JSON)))
+        self.path.write_text("# L1_ESSENTIAL\\n## rule-a\\n## rule-b\\n")
+        return self.path
+
+
+def graduate_rules(dry_run=False):
+    CALLS.append(("graduate", dry_run))
+    pickle.dumps(Rule("a"))  # needs the module registered as `layers`
+    return [Path("a.md")], []
+'''
+
+
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    # The watcher registers layers.py as sys.modules["layers"]; undo that
+    monkeypatch.delitem(sys.modules, "layers", raising=False)
+    # ... and putting its directory on sys.path
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    layers_py = tmp_path / "layers.py"
+    layers_py.write_text(FAKE_LAYERS)
+    rules = tmp_path / "procedural" / "rules.json"
+    rules.parent.mkdir()
+    rules.write_text('{"rules": []}')
+    return l1_watch.L1Watcher(
+        rules_json=rules,
+        l1_output=tmp_path / "layers" / "L1_essential.md",
+        state_file=tmp_path / "layers" / ".l1-last-rebuild",
+        log_file=tmp_path / "logs" / "l1-rebuild.log",
+        lock_dir=tmp_path / "l1-rebuild.lock",
+        layers_py=layers_py,
+        debounce=0.05,
+    )
+
+
+class TestRebuild:
+    """Rebuild semantics match l1-rebuild.sh."""
+
+    def test_rebuild_builds_and_graduates(self, watcher):
+        assert watcher.rebuild() == "rebuilt"
+        calls = watcher._layers.CALLS
+        assert calls == [("build", str(watcher.rules_json)), ("graduate", False)]
+        assert watcher.l1_output.is_file()
+
+    def test_state_file_holds_sha1(self, watcher):
+        watcher.rebuild()
+        expected = hashlib.sha1(watcher.rules_json.read_bytes()).hexdigest()
+        assert watcher.state_file.read_text().strip() == expected
+
+    def test_unchanged_rules_skip_rebuild(self, watcher):
+        watcher.rebuild()
+        assert watcher.rebuild() == "unchanged"
+        assert len(watcher._layers.CALLS) == 2
+
+    def test_changed_rules_rebuild_again(self, watcher):
+        watcher.rebuild()
+        watcher.rules_json.write_text('{"rules": [{"rule_id": "x"}]}')
+        assert watcher.rebuild() == "rebuilt"
+
+    def test_busy_lock_defers(self, watcher):
+        watcher.lock_dir.mkdir()
+        assert watcher.rebuild() == "locked"
+        assert watcher._layers is None
+        assert watcher.lock_dir.is_dir()
+
+    def test_stale_lock_removed(self, watcher):
+        watcher.lock_dir.mkdir()
+        old = time.time() - l1_watch.STALE_LOCK_AGE - 60
+        os.utime(watcher.lock_dir, (old, old))
+        assert watcher.rebuild() == "rebuilt"
+        assert "Removing stale lock" in watcher.log_file.read_text()
+
+    def test_stale_lock_reclaim_keeps_fresh_lock(self, watcher, monkeypatch):
+        watcher.lock_dir.mkdir()
+        old = time.time() - l1_watch.STALE_LOCK_AGE - 60
+        os.utime(watcher.lock_dir, (old, old))
+        rename = os.rename
+
+        def racing_rename(src, dst):
+            # Another watcher reclaims the stale lock and takes its own first
+            if src == watcher.lock_dir:
+                watcher.lock_dir.rmdir()
+                watcher.lock_dir.mkdir()
+            rename(src, dst)
+
+        monkeypatch.setattr(l1_watch.os, "rename", racing_rename)
+        assert watcher.rebuild() == "locked"
+        assert watcher.lock_dir.is_dir()
+        assert time.time() - watcher.lock_dir.stat().st_mtime < 60
+        assert [p.name for p in watcher.lock_dir.parent.iterdir()
+                if p.name.startswith("l1-rebuild.lock.")] == []
+
+    def test_lock_released(self, watcher):
+        watcher.rebuild()
+        assert not watcher.lock_dir.exists()
+
+    def test_no_graduate(self, watcher):
+        watcher.graduate = False
+        watcher.rebuild()
+        assert ("graduate", False) not in watcher._layers.CALLS
+
+    def test_layers_registered_as_module(self, watcher):
+        assert watcher.rebuild() == "rebuilt"
+        assert sys.modules["layers"] is watcher._layers
+
+    def test_layers_py_reloaded_when_changed(self, watcher):
+        watcher.rebuild()
+        first = watcher._layers
+        watcher.layers_py.write_text(FAKE_LAYERS.replace("VERSION = 1", "VERSION = 2  # updated"))
+        watcher.rules_json.write_text('{"rules": [{"rule_id": "x"}]}')
+        assert watcher.rebuild() == "rebuilt"
+        assert watcher._layers is not first
+        assert watcher._layers.VERSION == 2
+        assert "changed, reloading" in watcher.log_file.read_text()
+
+    def test_unchanged_layers_py_not_reloaded(self, watcher):
+        watcher.rebuild()
+        first = watcher._layers
+        watcher.rules_json.write_text('{"rules": [{"rule_id": "x"}]}')
+        watcher.rebuild()
+        assert watcher._layers is first
+
+    def test_layers_imports_neighbour_modules(self, watcher, monkeypatch):
+        monkeypatch.delitem(sys.modules, "l1_watch_neighbour", raising=False)
+        (watcher.layers_py.parent / "l1_watch_neighbour.py").write_text("VALUE = 42\n")
+        watcher.layers_py.write_text(
+            "from l1_watch_neighbour import VALUE\n" + FAKE_LAYERS)
+        assert watcher.rebuild() == "rebuilt"
+        assert watcher._layers.VALUE == 42
+
+    def test_missing_layers_py(self, watcher, tmp_path):
+        watcher.layers_py = tmp_path / "missing.py"
+        assert watcher.rebuild() == "error"
+        assert not watcher.lock_dir.exists()
+
+    def test_build_failure_logged(self, watcher):
+        watcher.layers_py.write_text(
+            "class Layer1:\n"
+            "    def __init__(self, path):\n"
+            "        pass\n"
+            "    def build(self):\n"
+            "        raise ValueError('bad rules.json')\n"
+        )
+        assert watcher.rebuild() == "error"
+        assert "bad rules.json" in watcher.log_file.read_text()
+        assert not watcher.state_file.exists()
+
+    def test_log_format(self, watcher):
+        watcher.rebuild()
+        lines = watcher.log_file.read_text().splitlines()
+        assert all(line.startswith("[") and "] l1-rebuild: " in line for line in lines)
+        assert "Rebuild complete — 2 rules" in lines[-1]
+
+
+class TestChangeDetection:
+    """Watch backends report changes to rules.json only."""
+
+    @pytest.fixture(params=["poll", "inotify"])
+    def watch(self, request, tmp_path):
+        path = tmp_path / "rules.json"
+        path.write_text("{}")
+        if request.param == "poll":
+            watch = l1_watch.PollingWatch(path, interval=0.01)
+        else:
+            try:
+                watch = l1_watch.InotifyWatch(path)
+            except (OSError, AttributeError):
+                pytest.skip("inotify not available")
+        yield watch
+        watch.close()
+
+    def test_timeout_without_change(self, watch):
+        assert watch.wait(0.05) is False
+
+    def test_detects_write(self, watch):
+        threading.Timer(0.02, lambda: watch.path.write_text('{"rules": []}')).start()
+        assert watch.wait(2.0) is True
+
+    def test_detects_atomic_replace(self, watch):
+        def replace():
+            tmp = watch.path.with_suffix(".tmp")
+            tmp.write_text('{"rules": [1]}')
+            os.replace(tmp, watch.path)
+
+        threading.Timer(0.02, replace).start()
+        assert watch.wait(2.0) is True
+
+    def test_wake_interrupts_wait(self, watch):
+        threading.Timer(0.02, watch.wake).start()
+        start = time.monotonic()
+        assert watch.wait(None) is False
+        assert time.monotonic() - start < 1.0
+
+    def test_ignores_other_files(self, watch):
+        if isinstance(watch, l1_watch.PollingWatch):
+            pytest.skip("polling only stats the watched file")
+        (watch.path.parent / "other.json").write_text("{}")
+        assert watch.wait(0.1) is False
+
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="Linux only")
+    def test_make_watch_prefers_inotify(self, tmp_path):
+        watch = l1_watch.make_watch(tmp_path / "rules.json")
+        try:
+            assert isinstance(watch, l1_watch.InotifyWatch)
+        finally:
+            watch.close()
+
+    def test_make_watch_poll_fallback(self, tmp_path):
+        watch = l1_watch.make_watch(tmp_path / "rules.json", poll=True)
+        assert isinstance(watch, l1_watch.PollingWatch)
+
+
+class TestRunLoop:
+    """The service catches up on start and rebuilds after settled changes."""
+
+    @pytest.fixture
+    def start(self, watcher):
+        """Run the watcher in a thread; stop and join it on teardown."""
+        started = []
+
+        def start_watcher():
+            watch = l1_watch.PollingWatch(watcher.rules_json, interval=0.01)
+            thread = threading.Thread(target=watcher.run, args=(watch,), daemon=True)
+            thread.start()
+            started.append((thread, watch))
+            return thread
+
+        yield start_watcher
+        watcher.stop()
+        for thread, watch in started:
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+            watch.close()
+
+    def test_rebuilds_after_change(self, watcher, start):
+        start()
+
+        deadline = time.monotonic() + 5
+        while not watcher.state_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        first_hash = watcher.state_file.read_text()
+
+        watcher.rules_json.write_text('{"rules": [{"rule_id": "new"}]}')
+        while watcher.state_file.read_text() == first_hash and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert watcher.state_file.read_text() != first_hash
+        builds = [call for call in watcher._layers.CALLS if call[0] == "build"]
+        assert len(builds) == 2
+
+    def test_busy_lock_retries_are_bounded(self, watcher, start):
+        watcher.lock_dir.mkdir()
+        watcher.lock_retries = 3
+        start()
+
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if watcher.log_file.exists() and "WARN" in watcher.log_file.read_text():
+                break
+            time.sleep(0.01)
+        # Backoff 0.05 + 0.1 + 0.2s, then no more attempts until a change
+        time.sleep(0.5)
+
+        log = watcher.log_file.read_text()
+        assert log.count("deferring") == 4
+        assert "still held after 3 retries, waiting for the next change" in log
+
+    def test_stop_ends_run_promptly(self, watcher, start):
+        thread = start()
+        deadline = time.monotonic() + 5
+        while not watcher.state_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # Idle in watch.wait(None): stop() must wake it, not wait for a change
+        stopped = time.monotonic()
+        watcher.stop()
+        thread.join(timeout=1)
+        assert not thread.is_alive()
+        assert time.monotonic() - stopped < 0.5
+
+    def test_stop_before_run_returns_at_once(self, watcher):
+        watch = l1_watch.PollingWatch(watcher.rules_json, interval=0.01)
+        watcher.stop()
+        try:
+            watcher.run(watch)
+        finally:
+            watch.close()
+        assert not watcher.state_file.exists()
+
+    def test_continuous_writes_rebuild_by_max_delay(self, watcher):
+        watcher.max_delay = 0.3
+        watch = l1_watch.PollingWatch(watcher.rules_json, interval=0.01)
+        stop = threading.Event()
+
+        def writer():
+            # Writes every 10ms, well inside the 50ms debounce
+            count = 0
+            while not stop.is_set():
+                count += 1
+                watcher.rules_json.write_text(f'{{"rules": [], "n": {count}}}')
+                time.sleep(0.01)
+
+        threading.Thread(target=writer, daemon=True).start()
+        try:
+            start = time.monotonic()
+            watcher.settle(watch)
+            elapsed = time.monotonic() - start
+        finally:
+            stop.set()
+        assert 0.3 <= elapsed < 1.0
+
+    def test_settle_returns_after_quiet_period(self, watcher):
+        watch = l1_watch.PollingWatch(watcher.rules_json, interval=0.01)
+        start = time.monotonic()
+        watcher.settle(watch)
+        assert time.monotonic() - start < watcher.max_delay